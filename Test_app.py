@@ -0,0 +1,642 @@
+"""
+Tests for the fleet expense app.
+Runs against in-memory SQLite by default; set TEST_DATABASE_URL (e.g. to a
+local PostgreSQL) to run the same suite against another backend.
+"""
+
+import csv
+import io
+import json
+import os
+import random
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+os.environ.setdefault('REPORT_CACHE_DIR', tempfile.mkdtemp())
+os.environ.setdefault('REPORT_DIR', tempfile.mkdtemp())
+
+from flask import Flask
+from reportlab import rl_config
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from sqlalchemy import create_engine, event, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+import columnar_export
+from combined_report import render_combined_pdf
+from mailer import Mailer
+from report_cache import ReportCache
+from instrumentation import Instrumentation
+
+from app import (app, db, report_cache, Vehicle, Member, ExpenseRecord, ExpenseRollup, JobRun, ReportJob, SchedulerLease,
+                 migrate_db, import_records, rebuild_rollup, data_version, bump_data_version,
+                 acquire_lease, run_recorded, fetch_records, recompute_totals, purge_report_jobs,
+                 DELTA_HEADER, REPORT_JOB_TTL)
+
+
+class QueryCounter:
+    """Count SQL statements executed on the engine while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._on_execute)
+
+
+class ReportQueryCountTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.drop_all()
+        db.create_all()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+
+    def add_records(self, n):
+        # a fresh vehicle/member per record so lazy loading would cost a query each
+        for i in range(n):
+            vehicle = Vehicle(name=f'Car {i}')
+            member = Member(name=f'Driver {i}')
+            db.session.add_all([vehicle, member])
+            db.session.flush()
+            db.session.add(ExpenseRecord(month='2024-01', vehicle_id=vehicle.id, member_id=member.id,
+                                         company_credit=100.0, total_profit_after_tax=50.0))
+        db.session.commit()
+        db.session.expunge_all()
+        # each run starts from an empty report cache
+        report_cache.directory = tempfile.mkdtemp()
+
+    def count_queries(self, url, n):
+        db.drop_all()
+        db.create_all()
+        self.add_records(n)
+        with QueryCounter() as counter:
+            response = self.client.get(url)
+            response.get_data()
+        self.assertEqual(response.status_code, 200)
+        return counter.count
+
+    def test_export_csv_query_count_is_constant(self):
+        self.assertEqual(self.count_queries('/export_csv', 3), self.count_queries('/export_csv', 30))
+
+    def test_report_pdf_query_count_is_constant(self):
+        self.assertEqual(self.count_queries('/report_pdf', 3), self.count_queries('/report_pdf', 30))
+
+    def test_report_pdf_vehicle_query_count_is_constant(self):
+        # records for a single vehicle, each with its own member
+        counts = []
+        for n in (3, 30):
+            db.drop_all()
+            db.create_all()
+            vehicle = Vehicle(name='Car A')
+            db.session.add(vehicle)
+            db.session.flush()
+            vehicle_id = vehicle.id
+            for i in range(n):
+                member = Member(name=f'Driver {i}')
+                db.session.add(member)
+                db.session.flush()
+                db.session.add(ExpenseRecord(month='2024-01', vehicle_id=vehicle_id, member_id=member.id))
+            db.session.commit()
+            db.session.expunge_all()
+            report_cache.directory = tempfile.mkdtemp()
+            with QueryCounter() as counter:
+                response = self.client.get(f'/report_pdf_vehicle?vehicle_id={vehicle_id}')
+            self.assertEqual(response.status_code, 200)
+            counts.append(counter.count)
+        self.assertEqual(counts[0], counts[1])
+
+
+class BackendTest(unittest.TestCase):
+    """Schema, migrations and server-side aggregates on the configured backend"""
+
+    CSV = (
+        'month,vehicle,member,company_credit,petrol,driver_salary\n'
+        '2024-01,Car A,Driver 1,1000,50,300\n'
+        '2024-01,Car A,,500,20,100\n'
+        '2024-02,Car B,Driver 1,800,40,200\n'
+        '2024-03,,Driver 2,100,0,0\n'
+    )
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.drop_all()
+        migrate_db()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+
+    def test_migrate_db_is_idempotent(self):
+        self.assertEqual(migrate_db(), 0)
+
+    def test_migrate_db_upgrades_a_baseline_database(self):
+        db.drop_all()
+        # the tables as the original app created them, before any migration
+        for ddl in (
+            'CREATE TABLE vehicle (id INTEGER PRIMARY KEY, name VARCHAR(64) NOT NULL)',
+            "CREATE TABLE member (id INTEGER PRIMARY KEY, name VARCHAR(64) NOT NULL, member_type VARCHAR(32))",
+            'CREATE TABLE setting (id INTEGER PRIMARY KEY, key VARCHAR(128) NOT NULL UNIQUE, value VARCHAR(1024))',
+            'CREATE TABLE expense_record (id INTEGER PRIMARY KEY, month VARCHAR(20) NOT NULL, '
+            'vehicle_id INTEGER NOT NULL REFERENCES vehicle (id), member_id INTEGER REFERENCES member (id), '
+            + ', '.join(f'{name} FLOAT' for name in ('single_way_km', 'double_way_km', 'single_total_cost',
+                                                      'double_total_cost', 'tds_1_percent', 'maintenance',
+                                                      'driver_salary', 'vehicle_maintenance', 'cng_gas', 'petrol',
+                                                      'supervisor_commission', 'company_credit',
+                                                      'total_deduction', 'total_profit_after_tax')) + ')',
+            "INSERT INTO vehicle (id, name) VALUES (1, 'Car A')",
+            "INSERT INTO expense_record (id, month, vehicle_id, company_credit, petrol, total_deduction, "
+            "total_profit_after_tax) VALUES (1, '2024-01', 1, 1000, 50, 50, 950), (2, 'Jan 2024', 1, 10, 0, 0, 10)",
+        ):
+            db.session.execute(text(ddl))
+        db.session.commit()
+
+        self.assertEqual(migrate_db(), 4)
+        rows = db.session.execute(text('SELECT month, period, change_seq FROM expense_record ORDER BY id')).all()
+        self.assertEqual([(r.month, r.period) for r in rows], [('2024-01', 202401), ('Jan 2024', None)])
+        self.assertTrue(all(r.change_seq for r in rows))
+        self.assertEqual(migrate_db(), 0)
+        # the rollup is filled without visiting /initdb
+        data = self.client.get('/api/charts').get_json()['vehicles']
+        car_a = next(v for v in data.values() if v['name'] == 'Car A')
+        self.assertEqual(car_a['summary'], {
+            'total_credit': 1010.0, 'total_deduction': 50.0, 'total_profit': 960.0, 'record_count': 2
+        })
+
+    def test_import_updates_rollup_and_data_version(self):
+        before = data_version()
+        stats = import_records(io.StringIO(self.CSV))
+        self.assertEqual((stats['created'], stats['rejected']), (3, 1))
+        self.assertNotEqual(data_version(), before)
+        self.assertEqual(ExpenseRecord.query.count(), 3)
+        self.assertEqual(fetch_records(start_month='2024-02', end_month='2024-12').count(), 1)
+
+        incremental = sorted((r.vehicle_id, r.month, r.member_id or 0, r.record_count, r.total_profit_after_tax)
+                             for r in ExpenseRollup.query.all())
+        rebuild_rollup()
+        rebuilt = sorted((r.vehicle_id, r.month, r.member_id or 0, r.record_count, r.total_profit_after_tax)
+                         for r in ExpenseRollup.query.all())
+        self.assertEqual(incremental, rebuilt)
+
+    def test_charts_aggregates(self):
+        import_records(io.StringIO(self.CSV))
+        data = self.client.get('/api/charts').get_json()['vehicles']
+        car_a = next(v for v in data.values() if v['name'] == 'Car A')
+        self.assertEqual(car_a['summary'], {
+            'total_credit': 1500.0, 'total_deduction': 470.0, 'total_profit': 1030.0, 'record_count': 2
+        })
+        data = self.client.get('/api/charts?month=2024-02').get_json()['vehicles']
+        car_a = next(v for v in data.values() if v['name'] == 'Car A')
+        self.assertEqual(car_a['summary']['record_count'], 0)
+
+    def test_month_filter_keeps_free_text_months(self):
+        import_records(io.StringIO(self.CSV + 'Jan 2024,Car B,,10,0,0\nQ1 2023,Car B,,10,0,0\n'))
+        self.assertEqual(ExpenseRecord.query.filter(ExpenseRecord.period.is_(None)).count(), 2)
+        self.assertEqual(sorted(r.month for r in fetch_records(month_like='2024')),
+                         ['2024-01', '2024-01', '2024-02', 'Jan 2024'])
+        self.assertEqual(fetch_records(month_like='2024-01').count(), 2)
+        self.assertEqual([r.month for r in fetch_records(month_like='jan')], ['Jan 2024'])
+
+    def test_cached_export_is_not_served_after_writes(self):
+        import_records(io.StringIO(self.CSV))
+
+        def exported_months():
+            response = self.client.get('/export_csv')
+            months = sorted(r['month'] for r in csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+            response.close()
+            return months
+
+        self.assertEqual(exported_months(), ['2024-01', '2024-01', '2024-02'])
+        self.assertEqual(exported_months(), ['2024-01', '2024-01', '2024-02'])  # served from the cache
+
+        car_a = Vehicle.query.filter_by(name='Car A').one()
+        self.client.post('/add', data={'month': '2024-05', 'vehicle_id': car_a.id})
+        self.assertEqual(exported_months(), ['2024-01', '2024-01', '2024-02', '2024-05'])
+
+        upload = (io.BytesIO(b'month,vehicle,company_credit\n2024-06,Car A,10\n'), 'more.csv')
+        self.client.post('/import_csv', data={'file': upload}, content_type='multipart/form-data')
+        self.assertEqual(exported_months(), ['2024-01', '2024-01', '2024-02', '2024-05', '2024-06'])
+
+        driver = Member.query.filter_by(name='Driver 1').one()
+        self.client.post('/delete_member', data={'member_id': driver.id})
+        self.assertEqual(exported_months(), ['2024-01', '2024-05', '2024-06'])
+
+        self.client.post('/delete_vehicle', data={'vehicle_id': car_a.id})
+        self.assertEqual(exported_months(), [])
+
+    def test_bump_data_version(self):
+        bump_data_version()
+        db.session.commit()
+        bump_data_version()
+        db.session.commit()
+        self.assertEqual(data_version(), '2')
+
+    def test_export_delta_returns_changes_since_watermark(self):
+        import_records(io.StringIO(self.CSV))
+        response = self.client.get('/export_delta?format=ndjson')
+        first = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(first), 3)
+        watermark = response.headers['X-Next-Watermark']
+
+        import_records(io.StringIO(self.CSV.splitlines()[0] + '\n2024-04,Car C,Driver 3,10,1,1\n'))
+        response = self.client.get(f'/export_delta?since={watermark}')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual([r['vehicle'] for r in rows], ['Car C'])
+        self.assertGreater(int(response.headers['X-Next-Watermark']), int(watermark))
+
+        response = self.client.get(f"/export_delta?since={response.headers['X-Next-Watermark']}")
+        self.assertEqual(response.get_data(as_text=True).splitlines(), [','.join(DELTA_HEADER)])
+
+    def test_recompute_totals_fixes_stale_rows(self):
+        import_records(io.StringIO(self.CSV))
+        self.assertEqual(recompute_totals(), 0)
+        car_b = ExpenseRecord.query.filter_by(month='2024-02').one()
+        db.session.execute(update(ExpenseRecord).where(ExpenseRecord.id == car_b.id)
+                           .values(total_deduction=0.0, total_profit_after_tax=None))
+        db.session.commit()
+        self.assertEqual(recompute_totals(batch_size=1), 1)
+        db.session.expire_all()
+        self.assertEqual((car_b.total_deduction, car_b.total_profit_after_tax, car_b.period), (240.0, 560.0, 202402))
+        self.assertEqual(sum(r.total_deduction for r in ExpenseRollup.query.all()), 710.0)
+
+    @unittest.skipUnless(columnar_export.AVAILABLE, 'pyarrow is not installed')
+    def test_columnar_exports_match_filters(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import_records(io.StringIO(self.CSV))
+        table = pq.read_table(io.BytesIO(self.client.get('/export_parquet?month=2024-01').get_data()))
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(table.schema.field('company_credit').type, pa.float64())
+        self.assertEqual(sorted(table.column('company_credit').to_pylist()), [500.0, 1000.0])
+        table = pa.ipc.open_stream(self.client.get('/export_arrow?start_month=2024-02').get_data()).read_all()
+        self.assertEqual(table.column('vehicle').to_pylist(), ['Car B'])
+
+    def test_records_api_pages_with_a_cursor(self):
+        import_records(io.StringIO(self.CSV))
+        ids = [r.id for r in ExpenseRecord.query.order_by(ExpenseRecord.id.desc())]
+        page = self.client.get('/api/records?limit=2').get_json()
+        self.assertEqual([r['id'] for r in page['records']], ids[:2])
+        self.assertEqual(page['next_cursor'], ids[1])
+        page = self.client.get(f"/api/records?limit=2&before_id={page['next_cursor']}").get_json()
+        self.assertEqual(([r['id'] for r in page['records']], page['next_cursor']), (ids[2:], None))
+        # out-of-range limits are clamped to 1..MAX_PAGE_SIZE; 0 and junk mean the default
+        for limit, size, cursor in (('-1', 1, ids[0]), ('-2', 1, ids[0]), ('0', 3, None),
+                                    ('abc', 3, None), ('100000', 3, None)):
+            response = self.client.get(f'/api/records?limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            page = response.get_json()
+            self.assertEqual((len(page['records']), page['next_cursor']), (size, cursor), limit)
+
+    def wait_for_job(self, job_id):
+        deadline = time.monotonic() + 30
+        while True:
+            status = self.client.get(f'/report_jobs/{job_id}').get_json()['status']
+            if status not in ('queued', 'running'):
+                return status
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+
+    def test_dead_report_jobs_are_not_shared(self):
+        filters = json.dumps({'vehicle_id': None, 'start_month': None, 'end_month': None}, sort_keys=True)
+        now = datetime.utcnow()
+        long_ago = now - timedelta(hours=1)
+        db.session.add_all([
+            # process gone: no heartbeat for an hour
+            ReportJob(id='dead', kind='report_pdf', filters=filters, filename='a.pdf', status='running',
+                      owner='other:1', created_at=long_ago, started_at=long_ago, heartbeat_at=long_ago),
+            # process alive, but the render overran REPORT_RENDER_TIMEOUT
+            ReportJob(id='hung', kind='report_pdf', filters=filters, filename='a.pdf', status='running',
+                      owner='other:2', created_at=long_ago, started_at=long_ago, heartbeat_at=now),
+        ])
+        db.session.commit()
+        self.assertEqual(self.client.get('/report_jobs/dead').get_json()['status'], 'failed')
+        job_id = self.client.get('/report_pdf?async=1').get_json()['job_id']
+        self.assertNotIn(job_id, ('dead', 'hung'))
+        self.assertEqual(self.wait_for_job(job_id), 'done')
+        db.session.expire_all()
+        self.assertEqual(db.session.get(ReportJob, 'hung').status, 'failed')
+
+        # a job whose process is alive is shared
+        db.session.add(ReportJob(id='live', kind='report_pdf', filters=filters, filename='a.pdf', status='running',
+                                 owner='other:3', created_at=now, started_at=now, heartbeat_at=now))
+        db.session.commit()
+        self.assertEqual(self.client.get('/report_pdf?async=1').get_json()['job_id'], 'live')
+
+    def test_report_job_state_is_shared_and_expires(self):
+        import_records(io.StringIO(self.CSV))
+        response = self.client.get('/report_pdf?async=1')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['job_id']
+        self.assertEqual(self.wait_for_job(job_id), 'done')
+        self.assertTrue(self.client.get(f'/report_jobs/{job_id}/download').get_data().startswith(b'%PDF'))
+
+        db.session.expire_all()
+        path = db.session.get(ReportJob, job_id).path
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(purge_report_jobs(), 0)
+        self.assertEqual(purge_report_jobs(now=datetime.utcnow() + timedelta(seconds=REPORT_JOB_TTL + 1)), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.client.get(f'/report_jobs/{job_id}').status_code, 404)
+
+    def test_lease_has_a_single_owner(self):
+        self.assertTrue(acquire_lease('test', 'a', 60))
+        self.assertFalse(acquire_lease('test', 'b', 60))
+        self.assertTrue(acquire_lease('test', 'a', 60))
+
+    def test_jobs_run_only_while_holding_the_scheduler_lease(self):
+        calls = []
+
+        def job():
+            calls.append(1)
+            return True, 'done'
+
+        with mock.patch('app.SCHEDULER_OWNER', 'worker-1'):
+            run_recorded('test_job', job)
+            db.session.execute(update(SchedulerLease).values(owner='worker-2'))
+            db.session.commit()
+            run_recorded('test_job', job)
+            with mock.patch('app.acquire_lease', side_effect=OperationalError('UPDATE', {}, 'database is locked')):
+                run_recorded('test_job', job)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([(r.owner, r.status, r.message) for r in JobRun.query.all()],
+                         [('worker-1', 'success', 'done')])
+
+
+class ReportCacheTest(unittest.TestCase):
+    """Size cap, LRU order and DATA_VERSION keys of the report file cache"""
+
+    def setUp(self):
+        self.cache = ReportCache(tempfile.mkdtemp(), max_bytes=30)
+
+    def put_at(self, key, mtime):
+        path = self.cache.put(key, b'x' * 10)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_evicts_least_recently_used_past_the_size_cap(self):
+        now = time.time()
+        for i, key in enumerate(('a', 'b', 'c')):
+            self.put_at(key, now - 100 + i)
+        self.cache.put('d', b'x' * 10)
+        self.assertEqual(sorted(os.listdir(self.cache.directory)), ['b', 'c', 'd'])
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_get_marks_an_entry_recently_used(self):
+        now = time.time()
+        for i, key in enumerate(('a', 'b', 'c')):
+            self.put_at(key, now - 100 + i)
+        self.assertIsNotNone(self.cache.get('a'))
+        self.cache.put('d', b'x' * 10)
+        self.assertEqual(sorted(os.listdir(self.cache.directory)), ['a', 'c', 'd'])
+
+    def test_entry_larger_than_the_cap_is_kept_alone(self):
+        self.cache.put('a', b'x' * 10)
+        self.cache.put('big', b'x' * 100)
+        self.assertEqual(os.listdir(self.cache.directory), ['big'])
+
+    def test_open_reader_survives_eviction(self):
+        self.cache.put('a', b'cached bytes')
+        with self.cache.open_reader('a') as fh:
+            self.cache.max_bytes = 0
+            self.cache.evict()
+            self.assertIsNone(self.cache.get('a'))
+            self.assertEqual(fh.read(), b'cached bytes')
+        self.assertIsNone(self.cache.open_reader('a'))
+
+    def test_key_changes_with_data_version(self):
+        filters = {'vehicle_id': 1, 'month_like': None}
+        self.assertEqual(ReportCache.make_key('export_csv', filters, '1'),
+                         ReportCache.make_key('export_csv', dict(reversed(filters.items())), '1'))
+        self.assertNotEqual(ReportCache.make_key('export_csv', filters, '1'),
+                            ReportCache.make_key('export_csv', filters, '2'))
+
+
+def serial_combined_pdf(month, sections):
+    """The combined PDF as the monthly summary drew it before sections were rendered separately"""
+    fh = io.BytesIO()
+    c = canvas.Canvas(fh, pagesize=letter)
+    width, height = letter
+    x = 40
+    y = height - 40
+    c.setFont('Helvetica-Bold', 16)
+    c.drawString(x, y, f'Fleet Combined Expense Report - {month}')
+    c.setFont('Helvetica', 9)
+    y -= 24
+    for name, rows in sections:
+        c.setFont('Helvetica-Bold', 12)
+        c.drawString(x, y, f'Vehicle: {name} (records: {len(rows)})')
+        y -= 14
+        c.setFont('Helvetica', 9)
+        c.drawString(x, y, 'ID | Month | Member | Credit | Profit')
+        y -= 12
+        for rid, row_month, member, credit, profit in rows:
+            c.drawString(x, y, f"{rid} | {row_month} | {member} | {credit:.2f} | {profit:.2f}")
+            y -= 12
+            if y < 60:
+                c.showPage()
+                y = height - 40
+        y -= 10
+        if y < 60:
+            c.showPage()
+            y = height - 40
+    c.save()
+    return fh.getvalue()
+
+
+class CombinedReportTest(unittest.TestCase):
+    """The section-spliced combined PDF must match the serial drawing byte for byte"""
+
+    def setUp(self):
+        # fixed document ids and timestamps, so equal drawings give equal bytes
+        self.invariant = rl_config.invariant
+        rl_config.invariant = 1
+
+    def tearDown(self):
+        rl_config.invariant = self.invariant
+
+    @staticmethod
+    def sections(row_counts):
+        rid = 0
+        sections = []
+        for i, count in enumerate(row_counts):
+            rows = []
+            for _ in range(count):
+                rid += 1
+                rows.append((rid, '2024-01', f'Driver {rid % 3}', rid * 10.5, rid * 3.25))
+            sections.append((f'Car {i}', rows))
+        return sections
+
+    def assert_identical(self, row_counts, workers=1):
+        sections = self.sections(row_counts)
+        fh = io.BytesIO()
+        render_combined_pdf(fh, '2024-01', sections, workers=workers)
+        self.assertEqual(fh.getvalue(), serial_combined_pdf('2024-01', sections), (row_counts, workers))
+
+    def test_page_break_edges(self):
+        # around the row counts that fill the first page exactly
+        for count in range(50, 66):
+            self.assert_identical([count])
+            self.assert_identical([count, 1])
+            self.assert_identical([3, count, 2])
+        self.assert_identical([1] * 40)
+
+    def test_random_layouts(self):
+        rng = random.Random(12)
+        for _ in range(60):
+            self.assert_identical([rng.randint(1, 130) for _ in range(rng.randint(1, 6))])
+
+    def test_process_pool_matches(self):
+        rng = random.Random(5)
+        layouts = [[57, 58, 59], [rng.randint(1, 130) for _ in range(5)]]
+        for row_counts in layouts:
+            for workers in (2, 3):
+                self.assert_identical(row_counts, workers)
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask('instrumented')
+        self.instrumentation = Instrumentation(slow_request_ms=0, slow_query_ms=60000)
+        self.instrumentation.init_app(self.app)
+        engine = create_engine('sqlite://')
+
+        @self.app.route('/two_queries')
+        def two_queries():
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+                conn.execute(text('SELECT 2'))
+            return 'ok'
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.instrumentation.detach()
+        self.assertFalse(event.contains(Engine, 'after_cursor_execute', self.instrumentation._after_cursor))
+
+    def test_server_timing_and_metrics(self):
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            response = self.client.get('/two_queries')
+        self.assertIn('sql;dur=', response.headers['Server-Timing'])
+        self.assertIn('desc="2 queries"', response.headers['Server-Timing'])
+        self.assertIn('Slow request GET /two_queries', logs.output[0])
+        metrics = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('http_requests_total{method="GET",endpoint="two_queries",status="200"} 1', metrics)
+        self.assertIn('http_request_sql_queries_total{method="GET",endpoint="two_queries",status="200"} 2', metrics)
+        self.assertIn('http_request_duration_seconds_count{method="GET",endpoint="two_queries"} 1', metrics)
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Minimal local SMTP server: counts connections, keeps delivered messages,
+    and can drop the connection on the next MAIL command to simulate a transient failure"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.connections = 0
+        self.messages = []
+        self.drop_next_mail = False
+        self.lock = threading.Lock()
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 stand-in ready')
+        for raw in self.rfile:
+            command = raw.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 stand-in')
+            elif command.startswith('MAIL'):
+                with server.lock:
+                    drop, server.drop_next_mail = server.drop_next_mail, False
+                if drop:
+                    return
+                self.reply('250 OK')
+            elif command.startswith(('RCPT', 'NOOP', 'RSET')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                    lines.append(data.decode())
+                with server.lock:
+                    server.messages.append(''.join(lines))
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+
+class MailerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SMTPStandIn()
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.mailer = Mailer('127.0.0.1', self.server.server_address[1], starttls=False,
+                             backoff=0, timeout=5)
+
+    def tearDown(self):
+        self.mailer.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_outbox_reuses_one_connection(self):
+        futures = [self.mailer.enqueue('fleet@example.com', ['owner@example.com'], f'Subject: {i}\r\n\r\nbody {i}')
+                   for i in range(3)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [(True, 'Email sent')] * 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual([m.splitlines()[0] for m in self.server.messages], ['Subject: 0', 'Subject: 1', 'Subject: 2'])
+
+    def test_transient_disconnect_is_retried_on_a_new_connection(self):
+        self.assertEqual(self.mailer.send_now('fleet@example.com', ['owner@example.com'], 'first'),
+                         (True, 'Email sent'))
+        self.server.drop_next_mail = True
+        self.assertEqual(self.mailer.send_now('fleet@example.com', ['owner@example.com'], 'second'),
+                         (True, 'Email sent'))
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual([m.strip() for m in self.server.messages], ['first', 'second'])
+
+    def test_gives_up_after_max_retries(self):
+        self.mailer.max_retries = 0
+        self.server.drop_next_mail = True
+        ok, info = self.mailer.send_now('fleet@example.com', ['owner@example.com'], 'lost')
+        self.assertFalse(ok)
+        self.assertEqual(self.server.messages, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
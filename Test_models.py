@@ -0,0 +1,277 @@
+"""
+Tests for the school management models.
+"""
+
+import gc
+import random
+import unittest
+
+from models import School, Student, Teacher, Staff, Course, Classroom, TimeSlot, IntervalIndex
+from timetable import TimetableSolver, apply_timetable, build_timetable, find_violations, weekly_slots
+
+
+def make_student(i):
+    return Student(f'Student {i}', f's{i}@school.com', '555-0100', 'Main St', '10A', '2024-01-15')
+
+
+class SchoolRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.school = School('Test School', 'Main St')
+
+    def test_lookup_and_remove_by_id(self):
+        students = [make_student(i) for i in range(5)]
+        for s in students:
+            self.school.add_student(s)
+        self.assertIs(self.school.get_student(students[3].id), students[3])
+        self.school.remove_student(students[1].id)
+        self.school.remove_student('missing')
+        self.assertIsNone(self.school.get_student(students[1].id))
+        self.assertEqual(self.school.get_all_students(), [students[0]] + students[2:])
+        self.assertEqual(self.school.get_total_students(), 4)
+
+    def test_colliding_id_gets_a_fresh_one(self):
+        first, second = make_student(1), make_student(2)
+        second.id = first.id
+        self.school.add_student(first)
+        self.school.add_student(second)
+        self.assertNotEqual(first.id, second.id)
+        self.assertIs(self.school.get_student(second.id), second)
+        # adding the same object again keeps a single entry
+        self.school.add_student(first)
+        self.assertEqual(self.school.get_total_students(), 2)
+
+    def test_other_registries(self):
+        teacher = Teacher('T', 't@school.com', '555', 'St', 'Math', 50000)
+        staff = Staff('S', 's@school.com', '555', 'St', 'Admin', 'Clerk', 30000)
+        course = Course('Algebra', 'MATH101', 'Intro', 3)
+        room = Classroom('101', 30, 'Main')
+        self.school.add_teacher(teacher)
+        self.school.add_staff(staff)
+        self.school.add_course(course)
+        self.school.add_classroom(room)
+        self.assertIs(self.school.get_teacher(teacher.id), teacher)
+        self.assertIs(self.school.get_staff(staff.id), staff)
+        self.assertIs(self.school.get_course(course.id), course)
+        self.assertIs(self.school.get_classroom(room.id), room)
+        self.school.remove_classroom(room.id)
+        self.assertEqual(self.school.get_all_classrooms(), [])
+        self.assertEqual(self.school.teachers, [teacher])
+
+    def test_entities_are_slotted(self):
+        student = make_student(1)
+        self.assertFalse(hasattr(student, '__dict__'))
+        self.assertEqual(list(student.to_dict()), ['id', 'name', 'email', 'phone', 'address', 'type',
+                                                   'grade', 'enrollment_date', 'courses', 'grades', 'gpa'])
+        created = student.created_at
+        student.created_at = created
+        self.assertEqual(student.created_at, created)
+        with self.assertRaises(AttributeError):
+            student.nickname = 'x'
+
+
+class EnrollmentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.school = School('Test School', 'Main St')
+        self.students = [make_student(i) for i in range(3)]
+        self.courses = [Course(f'Course {i}', f'C{i}', '', 3) for i in range(2)]
+        for s in self.students:
+            self.school.add_student(s)
+        for c in self.courses:
+            self.school.add_course(c)
+
+    def test_enrollment_is_bidirectional_and_ordered(self):
+        algebra, physics = self.courses
+        a, b, c = self.students
+        algebra.add_student(b)
+        algebra.add_student(a)
+        algebra.add_student(b)
+        c.add_course(algebra)
+        a.add_course(physics)
+        self.assertEqual(algebra.students, [b, a, c])
+        self.assertEqual(algebra.get_student_count(), 3)
+        self.assertEqual(a.courses, [algebra, physics])
+        algebra.remove_student(a)
+        self.assertEqual(a.courses, [physics])
+        self.assertEqual(algebra.students, [b, c])
+        self.assertEqual(algebra.to_dict()['student_count'], 2)
+        self.assertEqual(a.to_dict()['courses'], ['Course 1'])
+
+    def test_removing_entities_drops_their_enrollments(self):
+        algebra, physics = self.courses
+        a, b, _ = self.students
+        teacher = Teacher('T', 't@school.com', '555', 'St', 'Math', 50000)
+        self.school.add_teacher(teacher)
+        algebra.assign_teacher(teacher)
+        for course in self.courses:
+            course.add_student(a)
+            course.add_student(b)
+        self.school.remove_student(a.id)
+        self.assertEqual(algebra.students, [b])
+        self.assertEqual(physics.students, [b])
+        self.school.remove_course(physics.id)
+        self.assertEqual(b.courses, [algebra])
+        self.school.remove_teacher(teacher.id)
+        self.assertEqual(teacher.courses, [])
+        self.assertIsNone(algebra.teacher)
+
+    def test_enrollments_are_released_with_the_school(self):
+        def live_students():
+            return sum(isinstance(o, Student) for o in gc.get_objects())
+
+        gc.collect()
+        before = live_students()
+        school = School('Other School', 'Main St')
+        course = Course('History', 'H1', '', 3)
+        school.add_course(course)
+        for i in range(100):
+            student = make_student(i)
+            school.add_student(student)
+            course.add_student(student)
+        # a second school's enrollments are its own
+        self.assertEqual(self.courses[0].students, [])
+        self.assertEqual(live_students(), before + 100)
+        del school, course, student
+        gc.collect()
+        self.assertEqual(live_students(), before)
+
+
+class ScheduleTest(unittest.TestCase):
+
+    def test_parse_time_slot(self):
+        self.assertEqual(TimeSlot.parse('Mon 09:00-10:30'), TimeSlot(0, 540, 630))
+        self.assertEqual(TimeSlot.parse('friday 8:15 - 9:00'), TimeSlot(4, 495, 540))
+        self.assertEqual(str(TimeSlot.parse('13:00-14:00')), '13:00-14:00')
+        for bad in ('', 'Mon', '10:00-09:00', '09:75-10:00', 'Xyz 09:00-10:00'):
+            with self.assertRaises(ValueError):
+                TimeSlot.parse(bad)
+
+    def test_overlapping_slots_are_rejected(self):
+        room = Classroom('101', 30, 'Main')
+        course = Course('Algebra', 'MATH101', '', 3)
+        self.assertTrue(room.add_to_schedule(course, 'Mon 09:00-10:30'))
+        self.assertFalse(room.is_available('Mon 10:00-11:00'))
+        self.assertFalse(room.add_to_schedule(course, 'Mon 10:00-11:00'))
+        self.assertTrue(room.is_available('Mon 10:30-11:00'))
+        self.assertTrue(room.is_available('Tue 09:00-10:30'))
+        # a slot without a day repeats daily
+        self.assertFalse(room.is_available('10:00-10:15'))
+        self.assertEqual([e['time_slot'] for e in room.conflicts('08:00-12:00')], ['Mon 09:00-10:30'])
+        self.assertTrue(room.remove_from_schedule(course, 'Mon 09:00-10:30'))
+        self.assertTrue(room.is_available('10:00-10:15'))
+        self.assertEqual(room.to_dict()['schedule'], [])
+
+    def test_index_matches_brute_force(self):
+        rng = random.Random(7)
+        index = IntervalIndex()
+        stored = []
+        for _ in range(500):
+            start = rng.randrange(0, 1000)
+            end = start + rng.randrange(1, 30)
+            free = all(e <= start or end <= s for s, e in stored)
+            self.assertEqual(index.is_free(start, end), free)
+            self.assertEqual(sorted(index.overlapping(start, end)),
+                             sorted((s, e) for s, e in stored if s < end and start < e))
+            if free:
+                self.assertTrue(index.add(start, end, (start, end)))
+                stored.append((start, end))
+
+    def test_find_free_classrooms(self):
+        school = School('Test School', 'Main St')
+        rooms = [Classroom('A', 40, 'Main'), Classroom('B', 20, 'Main'), Classroom('C', 30, 'Main')]
+        for room in rooms:
+            school.add_classroom(room)
+        rooms[2].add_to_schedule(Course('Algebra', 'MATH101', '', 3), 'Wed 09:00-10:00')
+        free = school.find_free_classrooms('Wed 09:30-10:30', min_capacity=25)
+        self.assertEqual([r.room_number for r in free], ['A'])
+        free = school.find_free_classrooms('Thu 09:30-10:30', min_capacity=25)
+        self.assertEqual([r.room_number for r in free], ['C', 'A'])
+        # capacity edited after the room was added
+        rooms[1].capacity = 50
+        free = school.find_free_classrooms('Thu 09:30-10:30', min_capacity=25)
+        self.assertEqual([r.room_number for r in free], ['C', 'A', 'B'])
+        school.remove_classroom(rooms[0].id)
+        self.assertEqual([r.room_number for r in school.find_free_classrooms('Wed 09:30-10:30', min_capacity=25)],
+                         ['B'])
+
+    def test_booking_index_is_created_on_first_booking(self):
+        room = Classroom('101', 30, 'Main')
+        self.assertIsNone(room._bookings)
+        self.assertTrue(room.is_available('Mon 09:00-10:00'))
+        self.assertEqual(room.conflicts('Mon 09:00-10:00'), [])
+        self.assertFalse(room.remove_from_schedule(Course('Algebra', 'MATH101', '', 3), 'Mon 09:00-10:00'))
+        self.assertIsNone(room._bookings)
+
+
+class TimetableTest(unittest.TestCase):
+
+    def make_school(self, n_courses, n_rooms, capacity=30):
+        school = School('Test School', 'Main St')
+        rng = random.Random(3)
+        teachers = [Teacher(f'T{i}', '', '', '', 'Math', 1) for i in range(3)]
+        students = [make_student(i) for i in range(40)]
+        for t in teachers:
+            school.add_teacher(t)
+        for st in students:
+            school.add_student(st)
+        for i in range(n_courses):
+            course = Course(f'Course {i}', f'C{i}', '', 3)
+            course.assign_teacher(teachers[i % len(teachers)])
+            for st in rng.sample(students, 12):
+                course.add_student(st)
+            school.add_course(course)
+        for i in range(n_rooms):
+            school.add_classroom(Classroom(f'R{i}', capacity, 'Main'))
+        return school
+
+    def test_solution_is_conflict_free_and_written_to_schedules(self):
+        school = self.make_school(12, 2)
+        room = school.get_all_classrooms()[0]
+        room.add_to_schedule(Course('Assembly', 'A', '', 0), 'Mon 08:00-09:00')
+        slots = weekly_slots(days=['Mon', 'Tue', 'Wed'], periods=8)
+        result = build_timetable(school, slots=slots, sessions=2, time_budget=5)
+        self.assertTrue(result.complete)
+        self.assertEqual(find_violations(result, school.get_all_classrooms()), [])
+        self.assertEqual(sum(len(r.schedule) for r in school.get_all_classrooms()), 1 + 12 * 2)
+        self.assertEqual([e['course'].name for e in room.schedule if e['time_slot'] == 'Mon 08:00-09:00'],
+                         ['Assembly'])
+
+    def test_existing_bookings_are_kept_and_respected(self):
+        school = self.make_school(6, 2)
+        first, second = school.get_all_classrooms()
+        course = school.get_all_courses()[0]
+        first.add_to_schedule(course, 'Mon 08:00-09:00')
+        slots = weekly_slots(days=['Mon', 'Tue'], periods=6)
+        result = build_timetable(school, slots=slots, sessions=2, time_budget=5)
+        self.assertTrue(result.complete)
+        # one more session for the pre-booked course, not in the slot its people are already busy
+        self.assertEqual(len(result.placements[course]), 1)
+        self.assertNotEqual(result.placements[course][0][0], 'Mon 08:00-09:00')
+        self.assertEqual(find_violations(result, school.get_all_classrooms()), [])
+        # a second run has nothing left to place
+        again = build_timetable(school, slots=slots, sessions=2, time_budget=5)
+        self.assertEqual((again.placements, again.unscheduled), ({}, []))
+        self.assertEqual(sum(len(r.schedule) for r in school.get_all_classrooms()), 6 * 2)
+
+    def test_stale_result_is_not_written(self):
+        school = self.make_school(2, 1)
+        room = school.get_all_classrooms()[0]
+        result = TimetableSolver(school.get_all_courses(), [room], ['Mon 08:00-09:00', 'Mon 09:00-10:00']).solve(5)
+        slot = result.placements[school.get_all_courses()[1]][0][0]
+        room.add_to_schedule(Course('Assembly', 'A', '', 0), slot)
+        with self.assertRaises(ValueError):
+            apply_timetable(result)
+        self.assertEqual([e['course'].name for e in room.schedule], ['Assembly'])
+        self.assertEqual(len(find_violations(result, [room])), 1)
+
+    def test_unplaceable_courses_are_reported(self):
+        # rooms too small for any course
+        school = self.make_school(4, 3, capacity=5)
+        result = build_timetable(school, time_budget=1)
+        self.assertEqual(len(result.unscheduled), 4)
+        self.assertEqual(result.placements, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
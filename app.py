@@ -1,27 +1,115 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, and_, or_, select, insert, update, cast, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload, validates
 import os
 import io
+import re
 import csv
+import json
 import ssl
 import ipaddress
+import socket
+import sqlite3
+import sys
 from datetime import datetime, timedelta
+from collections import namedtuple
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from io import BytesIO
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 import tempfile
+import shutil
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import click
+from report_cache import ReportCache
+from mailer import Mailer
+from combined_report import render_combined_pdf
+import columnar_export
+from instrumentation import Instrumentation
+from expense_totals import INPUT_FIELDS, apply_totals, compute_totals_batch, fill_totals, stale_rows
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///expenses.db'
+
+
+def _database_url():
+    """DATABASE_URL from the environment (SQLite file by default; PostgreSQL URLs work too)."""
+    url = os.environ.get('DATABASE_URL', 'sqlite:///expenses.db')
+    # Heroku-style URLs use the postgres:// scheme SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+app.config['SQLALCHEMY_DATABASE_URI'] = _database_url()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'dev-key'
 
+# SQLite engine profile: 'wal' (default) turns on WAL journaling and the
+# pragmas below so dashboard reads don't block behind imports; 'default'
+# leaves SQLite's own settings alone.
+app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'wal')
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+}
+
+
+def _engine_options(uri):
+    """Pool settings for a threaded server; in-memory SQLite keeps Flask-SQLAlchemy's single static connection."""
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '20')),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', '30')),
+        # recycle before server-side idle timeouts (PostgreSQL, pgbouncer) drop connections
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': True,
+    }
+
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+
+@event.listens_for(Engine, 'connect')
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if app.config['SQLITE_PROFILE'] != 'wal' or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
 db = SQLAlchemy(app)
 
+# Opt-in request/SQL timing: Server-Timing headers, /metrics and slow-request logs
+app.config['INSTRUMENTATION'] = os.environ.get('INSTRUMENTATION', '0').lower() not in ('0', 'false', 'no', '')
+instrumentation = Instrumentation(
+    slow_request_ms=float(os.environ.get('SLOW_REQUEST_MS', '500')),
+    slow_query_ms=float(os.environ.get('SLOW_QUERY_MS', '100'))
+)
+if app.config['INSTRUMENTATION']:
+    instrumentation.init_app(app)
+
+# Generated CSV/PDF reports, keyed by endpoint, filters and data version
+report_cache = ReportCache(
+    os.environ.get('REPORT_CACHE_DIR', os.path.join(os.getcwd(), 'report_cache')),
+    int(os.environ.get('REPORT_CACHE_MAX_MB', '256')) * 1024 * 1024
+)
+
 
 class Vehicle(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -42,11 +130,31 @@ class Setting(db.Model):
     value = db.Column(db.String(1024), nullable=True)
 
 
+MONTH_RE = re.compile(r'^(\d{4})-(\d{1,2})(?!\d)')
+
+
+def month_to_period(month):
+    """Normalize a 'YYYY-MM' month string to a sortable integer YYYYMM (None if unparseable)."""
+    m = MONTH_RE.match((month or '').strip())
+    if not m or not 1 <= int(m.group(2)) <= 12:
+        return None
+    return int(m.group(1)) * 100 + int(m.group(2))
+
+
+def _default_period(context):
+    return month_to_period(context.get_current_parameters().get('month'))
+
+
 class ExpenseRecord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     month = db.Column(db.String(20), nullable=False)
+    # month as integer YYYYMM, kept in step with month; used for range filters
+    period = db.Column(db.Integer, default=_default_period)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False)
     member_id = db.Column(db.Integer, db.ForeignKey('member.id'), nullable=True)
+    # data version of the write that last created or changed the row; the delta export watermark
+    change_seq = db.Column(db.Integer, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     single_way_km = db.Column(db.Float, default=0.0)
     double_way_km = db.Column(db.Float, default=0.0)
@@ -65,12 +173,345 @@ class ExpenseRecord(db.Model):
     total_deduction = db.Column(db.Float, default=0.0)
     total_profit_after_tax = db.Column(db.Float, default=0.0)
 
+    __table_args__ = (
+        db.Index('ix_expense_record_vehicle_month', 'vehicle_id', 'month'),
+        db.Index('ix_expense_record_month', 'month'),
+        db.Index('ix_expense_record_vehicle_period', 'vehicle_id', 'period'),
+        db.Index('ix_expense_record_period', 'period'),
+        db.Index('ix_expense_record_change_seq', 'change_seq'),
+    )
+
+    @validates('month')
+    def _sync_period(self, key, month):
+        # an onupdate default would null period in UPDATEs that don't set month
+        self.period = month_to_period(month)
+        return month
+
+
+# ExpenseRecord columns that are summed into ExpenseRollup
+ROLLUP_FIELDS = [
+    'single_way_km', 'double_way_km', 'single_total_cost', 'double_total_cost',
+    'tds_1_percent', 'maintenance', 'driver_salary', 'vehicle_maintenance',
+    'cng_gas', 'petrol', 'supervisor_commission',
+    'company_credit', 'total_deduction', 'total_profit_after_tax',
+]
+
+
+class ExpenseRollup(db.Model):
+    """Running totals of ExpenseRecord per (vehicle, month, member).
+
+    Kept current by every write path so dashboards and summaries never
+    have to re-sum raw records. Regenerate with ``flask rebuild-rollup``.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), nullable=False)
+    month = db.Column(db.String(20), nullable=False)
+    member_id = db.Column(db.Integer, db.ForeignKey('member.id'), nullable=True)
+    record_count = db.Column(db.Integer, default=0)
+
+    single_way_km = db.Column(db.Float, default=0.0)
+    double_way_km = db.Column(db.Float, default=0.0)
+    single_total_cost = db.Column(db.Float, default=0.0)
+    double_total_cost = db.Column(db.Float, default=0.0)
+
+    tds_1_percent = db.Column(db.Float, default=0.0)
+    maintenance = db.Column(db.Float, default=0.0)
+    driver_salary = db.Column(db.Float, default=0.0)
+    vehicle_maintenance = db.Column(db.Float, default=0.0)
+    cng_gas = db.Column(db.Float, default=0.0)
+    petrol = db.Column(db.Float, default=0.0)
+    supervisor_commission = db.Column(db.Float, default=0.0)
+
+    company_credit = db.Column(db.Float, default=0.0)
+    total_deduction = db.Column(db.Float, default=0.0)
+    total_profit_after_tax = db.Column(db.Float, default=0.0)
+
+    __table_args__ = (db.UniqueConstraint('vehicle_id', 'month', 'member_id'),)
+
+
+def rollup_deltas(records, deltas=None):
+    """Accumulate per-key count and column sums of records into deltas.
+
+    records may be ExpenseRecord objects or plain dicts of column values.
+    """
+    if deltas is None:
+        deltas = {}
+    for r in records:
+        get = r.get if isinstance(r, dict) else lambda name, r=r: getattr(r, name)
+        key = (get('vehicle_id'), get('month'), get('member_id'))
+        d = deltas.setdefault(key, [0] + [0.0] * len(ROLLUP_FIELDS))
+        d[0] += 1
+        for i, name in enumerate(ROLLUP_FIELDS, 1):
+            d[i] += get(name) or 0
+    return deltas
+
+
+def rollup_apply(deltas):
+    """Add accumulated deltas onto their ExpenseRollup rows (no commit)."""
+    for (vehicle_id, month, member_id), d in deltas.items():
+        row = ExpenseRollup.query.filter_by(vehicle_id=vehicle_id, month=month, member_id=member_id).first()
+        if not row:
+            row = ExpenseRollup(vehicle_id=vehicle_id, month=month, member_id=member_id, record_count=0,
+                                **{name: 0.0 for name in ROLLUP_FIELDS})
+            db.session.add(row)
+        row.record_count += d[0]
+        for i, name in enumerate(ROLLUP_FIELDS, 1):
+            setattr(row, name, getattr(row, name) + d[i])
+
+
+def rollup_add(records):
+    """Fold newly created records into their ExpenseRollup rows (no commit)."""
+    rollup_apply(rollup_deltas(records))
+
+
+def data_version():
+    """Current data-version stamp; changes whenever expense data is written."""
+    s = Setting.query.filter_by(key='DATA_VERSION').first()
+    return s.value if s else '0'
+
+
+def bump_data_version():
+    """Advance the data-version stamp (no commit) so cached reports go stale.
+
+    Returns the new version, which is also stamped on the written records as
+    their change_seq. The UPDATE holds the row lock until commit, so versions
+    are handed out in commit order.
+    """
+    bumped = Setting.query.filter_by(key='DATA_VERSION').update(
+        {Setting.value: cast(cast(Setting.value, db.Integer) + 1, db.String)},
+        synchronize_session=False
+    )
+    if not bumped:
+        db.session.add(Setting(key='DATA_VERSION', value='1'))
+        return 1
+    return int(db.session.execute(select(Setting.value).where(Setting.key == 'DATA_VERSION')).scalar())
+
+
+def rebuild_rollup():
+    """Regenerate ExpenseRollup from raw ExpenseRecord rows; returns row count."""
+    ExpenseRollup.query.delete()
+    keys = [ExpenseRecord.vehicle_id, ExpenseRecord.month, ExpenseRecord.member_id]
+    sums = [func.coalesce(func.sum(getattr(ExpenseRecord, name)), 0.0) for name in ROLLUP_FIELDS]
+    select_totals = select(*keys, func.count(ExpenseRecord.id), *sums).group_by(*keys)
+    target = ['vehicle_id', 'month', 'member_id', 'record_count'] + ROLLUP_FIELDS
+    db.session.execute(insert(ExpenseRollup).from_select(target, select_totals))
+    db.session.commit()
+    return ExpenseRollup.query.count()
+
+
+@app.cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    """Rebuild the expense rollup table from raw records."""
+    count = rebuild_rollup()
+    print(f'Rebuilt {count} rollup rows')
+
+
+def recompute_totals(batch_size=5000):
+    """Recompute total_deduction/total_profit_after_tax for every record.
+
+    Rows are read in id order batch_size at a time, their totals computed
+    with the vectorized batch path, and only rows whose stored totals
+    differ are written back with one executemany UPDATE per batch. The
+    rollup is rebuilt if anything changed. Returns the number of rows fixed.
+    """
+    columns = [ExpenseRecord.id, ExpenseRecord.total_deduction,
+               ExpenseRecord.total_profit_after_tax] + [getattr(ExpenseRecord, name) for name in INPUT_FIELDS]
+    last_id = 0
+    fixed = 0
+    seq = None
+    while True:
+        rows = db.session.execute(
+            select(*columns).where(ExpenseRecord.id > last_id).order_by(ExpenseRecord.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        ids, old_deduction, old_profit, *inputs = zip(*rows)
+        deduction, profit = compute_totals_batch(dict(zip(INPUT_FIELDS, inputs)))
+        stale = stale_rows(deduction, profit, old_deduction, old_profit)
+        if not stale:
+            continue
+        if seq is None:
+            seq = bump_data_version()
+        db.session.execute(update(ExpenseRecord), [
+            {'id': ids[i], 'total_deduction': float(deduction[i]), 'total_profit_after_tax': float(profit[i]),
+             'change_seq': seq}
+            for i in stale
+        ])
+        fixed += len(stale)
+    db.session.commit()
+    if fixed:
+        rebuild_rollup()
+    return fixed
+
+
+@app.cli.command('recompute-totals')
+@click.option('--batch-size', type=int, default=5000, help='Rows per UPDATE batch.')
+def recompute_totals_command(batch_size):
+    """Recompute derived totals on all expense records in bulk."""
+    fixed = recompute_totals(batch_size=batch_size)
+    print(f'Fixed totals on {fixed} record(s)')
+
+
+# Schema migrations, applied in order by migrate_db(). Each step must be
+# safe to run against a database that already has the change, and must
+# not go through the current models: a step runs against the schema as it
+# was when the step was written, so it uses plain SQL.
+
+def _migrate_member_type():
+    columns = [c['name'] for c in inspect(db.engine).get_columns('member')]
+    if 'member_type' not in columns:
+        db.session.execute(text("ALTER TABLE member ADD COLUMN member_type VARCHAR(32) DEFAULT 'Member'"))
+        db.session.commit()
+
+
+def _migrate_expense_period():
+    columns = [c['name'] for c in inspect(db.engine).get_columns('expense_record')]
+    if 'period' not in columns:
+        db.session.execute(text('ALTER TABLE expense_record ADD COLUMN period INTEGER'))
+        db.session.commit()
+    # backfill period from month in batches
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            text('SELECT id, month FROM expense_record WHERE period IS NULL AND id > :last_id '
+                 'ORDER BY id LIMIT 5000'),
+            {'last_id': last_id}
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = [{'id': id_, 'period': month_to_period(month)} for id_, month in rows]
+        updates = [u for u in updates if u['period'] is not None]
+        if updates:
+            db.session.execute(text('UPDATE expense_record SET period = :period WHERE id = :id'), updates)
+        db.session.commit()
+    for name, columns in (('ix_expense_record_vehicle_month', 'vehicle_id, month'),
+                          ('ix_expense_record_month', 'month'),
+                          ('ix_expense_record_vehicle_period', 'vehicle_id, period'),
+                          ('ix_expense_record_period', 'period')):
+        db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON expense_record ({columns})'))
+    db.session.commit()
+
+
+def _migrate_expense_change_seq():
+    columns = [c['name'] for c in inspect(db.engine).get_columns('expense_record')]
+    if 'change_seq' not in columns:
+        db.session.execute(text('ALTER TABLE expense_record ADD COLUMN change_seq INTEGER'))
+    if 'updated_at' not in columns:
+        db.session.execute(text('ALTER TABLE expense_record ADD COLUMN updated_at TIMESTAMP'))
+    db.session.commit()
+    # existing rows count as one change at a fresh version, so since=0 returns them all
+    if db.session.execute(text('SELECT 1 FROM expense_record WHERE change_seq IS NULL LIMIT 1')).first():
+        seq = bump_data_version()
+        db.session.execute(
+            text('UPDATE expense_record SET change_seq = :seq, updated_at = COALESCE(updated_at, :now) '
+                 'WHERE change_seq IS NULL'),
+            {'seq': seq, 'now': datetime.utcnow()}
+        )
+    db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_expense_record_change_seq ON expense_record (change_seq)'))
+    db.session.commit()
+
+
+def _migrate_report_job_liveness():
+    columns = [c['name'] for c in inspect(db.engine).get_columns('report_job')]
+    for name in ('owner VARCHAR(128)', 'started_at TIMESTAMP', 'heartbeat_at TIMESTAMP'):
+        if name.split()[0] not in columns:
+            db.session.execute(text(f'ALTER TABLE report_job ADD COLUMN {name}'))
+    db.session.commit()
+
+
+MIGRATIONS = [_migrate_member_type, _migrate_expense_period, _migrate_expense_change_seq,
+              _migrate_report_job_liveness]
+
+
+def migrate_db():
+    """Create missing tables and apply pending MIGRATIONS; returns the number applied.
+
+    Also fills ExpenseRollup when it is empty but records exist (a database
+    from before the rollup table), so every upgrade path gets totals.
+    """
+    db.create_all()
+    s = Setting.query.filter_by(key='SCHEMA_VERSION').first()
+    done = int(s.value) if s and s.value else 0
+    for step in MIGRATIONS[done:]:
+        step()
+    if not s:
+        s = Setting(key='SCHEMA_VERSION')
+        db.session.add(s)
+    s.value = str(len(MIGRATIONS))
+    db.session.commit()
+    if ExpenseRollup.query.first() is None and ExpenseRecord.query.first() is not None:
+        rebuild_rollup()
+    return len(MIGRATIONS) - done
+
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Bring an existing expenses.db up to the current schema."""
+    applied = migrate_db()
+    print(f'Applied {applied} migration(s)')
+
+
+DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = 500
+
+VehicleRef = namedtuple('VehicleRef', 'id name')
+# Like the settings cache: adding or removing a vehicle clears it, and the
+# TTL bounds how long other worker processes can serve a stale list.
+VEHICLES_CACHE_TTL = float(os.environ.get('VEHICLES_CACHE_TTL', '30'))
+_vehicle_list = None
+_vehicles_loaded_at = 0.0
+
+
+def cached_vehicles():
+    """(id, name) of every vehicle for dropdowns, cached until a vehicle is added or removed."""
+    global _vehicle_list, _vehicles_loaded_at
+    vehicles = _vehicle_list
+    if vehicles is None or time.monotonic() - _vehicles_loaded_at > VEHICLES_CACHE_TTL:
+        vehicles = [VehicleRef(*row) for row in db.session.query(Vehicle.id, Vehicle.name).order_by(Vehicle.id)]
+        _vehicle_list = vehicles
+        _vehicles_loaded_at = time.monotonic()
+    return vehicles
+
+
+def invalidate_vehicles():
+    global _vehicle_list
+    _vehicle_list = None
+
+
+def record_page(before_id=None, limit=None):
+    """One page of records, newest first, starting below the before_id cursor.
+
+    Returns (records, next_cursor); next_cursor is None on the last page.
+    """
+    limit = max(1, min(limit or DASHBOARD_PAGE_SIZE, MAX_PAGE_SIZE))
+    q = ExpenseRecord.query.options(joinedload(ExpenseRecord.vehicle), joinedload(ExpenseRecord.member))
+    if before_id is not None:
+        q = q.filter(ExpenseRecord.id < before_id)
+    records = q.order_by(ExpenseRecord.id.desc()).limit(limit + 1).all()
+    if len(records) > limit:
+        return records[:limit], records[limit - 1].id
+    return records, None
+
 
 @app.route('/')
 def index():
-    vehicles = Vehicle.query.all()
-    records = ExpenseRecord.query.order_by(ExpenseRecord.id.desc()).all()
-    return render_template('index.html', vehicles=vehicles, records=records)
+    records, next_cursor = record_page(_parse_id(request.args.get('before_id')),
+                                       _parse_id(request.args.get('limit')))
+    return render_template('index.html', vehicles=cached_vehicles(), records=records,
+                           next_cursor=next_cursor)
+
+
+@app.route('/api/records')
+def records_api():
+    """Next page of dashboard records as JSON; pass next_cursor back as before_id"""
+    records, next_cursor = record_page(_parse_id(request.args.get('before_id')),
+                                       _parse_id(request.args.get('limit')))
+    return {
+        'records': [dict(zip(CSV_HEADER, _csv_row(r))) for r in records],
+        'next_cursor': next_cursor
+    }
 
 
 @app.route('/settings')
@@ -87,6 +528,7 @@ def add_vehicle():
         vehicle = Vehicle(name=name)
         db.session.add(vehicle)
         db.session.commit()
+        invalidate_vehicles()
         flash(f'Car "{name}" added successfully!', 'success')
     return redirect(url_for('settings'))
 
@@ -99,8 +541,11 @@ def delete_vehicle():
         if vehicle:
             # Delete associated records first
             ExpenseRecord.query.filter_by(vehicle_id=vehicle.id).delete()
+            ExpenseRollup.query.filter_by(vehicle_id=vehicle.id).delete()
+            bump_data_version()
             db.session.delete(vehicle)
             db.session.commit()
+            invalidate_vehicles()
             flash('Car deleted successfully!', 'success')
     return redirect(url_for('settings'))
 
@@ -125,6 +570,8 @@ def delete_member():
         if member:
             # Delete associated records first
             ExpenseRecord.query.filter_by(member_id=member.id).delete()
+            ExpenseRollup.query.filter_by(member_id=member.id).delete()
+            bump_data_version()
             db.session.delete(member)
             db.session.commit()
             flash('Member deleted successfully!', 'success')
@@ -160,15 +607,10 @@ def add_record():
             supervisor_commission=f('supervisor_commission'),
             company_credit=f('company_credit')
         )
-
-        record.total_deduction = (
-            record.tds_1_percent + record.maintenance + record.driver_salary
-            + record.vehicle_maintenance + record.cng_gas + record.petrol
-            + record.supervisor_commission
-        )
-        record.total_profit_after_tax = record.company_credit - record.total_deduction
-
+        apply_totals(record)
+        record.change_seq = bump_data_version()
         db.session.add(record)
+        rollup_add([record])
         db.session.commit()
         flash('Record added', 'success')
         return redirect(url_for('index'))
@@ -178,15 +620,8 @@ def add_record():
 
 @app.route('/initdb')
 def initdb():
-    db.create_all()
-    # Add member_type column if it doesn't exist
-    try:
-        from sqlalchemy import text
-        db.session.execute(text('ALTER TABLE member ADD COLUMN member_type VARCHAR(32) DEFAULT "Member"'))
-        db.session.commit()
-    except Exception:
-        pass  # Column already exists
-    
+    migrate_db()
+
     if Vehicle.query.count() == 0:
         vnames = ['Car A', 'Car B', 'Car C']
         for n in vnames:
@@ -200,48 +635,312 @@ def initdb():
     return 'DB initialized with sample vehicles and members. <a href="/">Go to Dashboard</a> | <a href="/settings">Manage Cars & Drivers</a>'
 
 
-@app.route('/export_csv')
-def export_csv():
-    vehicle_id = request.args.get('vehicle_id')
-    month = request.args.get('month')
-    start_month = request.args.get('start_month')
-    end_month = request.args.get('end_month')
-    q = ExpenseRecord.query
-    if vehicle_id:
-        try:
-            q = q.filter(ExpenseRecord.vehicle_id == int(vehicle_id))
-        except Exception:
-            pass
+def fetch_records(vehicle_id=None, month=None, month_like=None, start_month=None, end_month=None):
+    """Query ExpenseRecord rows for reports, ordered by id.
+
+    Vehicle and member are joined into the same SELECT so reading
+    ``r.vehicle.name`` / ``r.member.name`` never triggers a query per row.
+    """
+    q = ExpenseRecord.query.options(joinedload(ExpenseRecord.vehicle), joinedload(ExpenseRecord.member))
+    if vehicle_id is not None:
+        q = q.filter(ExpenseRecord.vehicle_id == vehicle_id)
     if month:
-        q = q.filter(ExpenseRecord.month.ilike(f"%{month}%"))
-    # If start/end provided (format YYYY-MM), do lexicographic compare
+        q = q.filter(ExpenseRecord.month == month)
+    if month_like:
+        q = q.filter(_month_like_filter(month_like))
+    # start/end (format YYYY-MM) compare on the indexed period column
     if start_month:
-        q = q.filter(ExpenseRecord.month >= start_month)
+        start = month_to_period(start_month)
+        q = q.filter(ExpenseRecord.period >= start if start else ExpenseRecord.month >= start_month)
     if end_month:
-        q = q.filter(ExpenseRecord.month <= end_month)
-    records = q.order_by(ExpenseRecord.id).all()
+        end = month_to_period(end_month)
+        q = q.filter(ExpenseRecord.period <= end if end else ExpenseRecord.month <= end_month)
+    return q.order_by(ExpenseRecord.id)
+
+
+def _month_like_filter(value):
+    """Filter for the export's free-text month param: a year or YYYY-MM use the period index.
+
+    Rows whose month is not YYYY-MM (e.g. 'Jan 2024') have no period and are
+    still matched by substring.
+    """
+    value = value.strip()
+    text_match = ExpenseRecord.month.ilike(f"%{value}%")
+    if re.fullmatch(r'\d{4}', value):
+        by_period = ExpenseRecord.period.between(int(value) * 100 + 1, int(value) * 100 + 12)
+    else:
+        period = month_to_period(value)
+        if not (period and re.fullmatch(r'\d{4}-\d{2}', value)):
+            return text_match
+        by_period = ExpenseRecord.period == period
+    return or_(by_period, and_(ExpenseRecord.period.is_(None), text_match))
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+CSV_HEADER = [
+    'id','month','vehicle','member','single_way_km','double_way_km',
+    'single_total_cost','double_total_cost','tds_1_percent','maintenance',
+    'driver_salary','vehicle_maintenance','cng_gas','petrol','supervisor_commission',
+    'company_credit','total_deduction','total_profit_after_tax'
+]
+CSV_CHUNK_ROWS = 1000
+
+
+def _csv_row(r):
+    return [
+        r.id, r.month, r.vehicle.name if r.vehicle else '', r.member.name if r.member else '',
+        r.single_way_km, r.double_way_km, r.single_total_cost, r.double_total_cost,
+        r.tds_1_percent, r.maintenance, r.driver_salary, r.vehicle_maintenance,
+        r.cng_gas, r.petrol, r.supervisor_commission, r.company_credit,
+        r.total_deduction, r.total_profit_after_tax
+    ]
+
+
+def _stream_csv(q):
+    """Yield the CSV export of query q in chunks of CSV_CHUNK_ROWS rows."""
     si = io.StringIO()
     writer = csv.writer(si)
-    header = [
-        'id','month','vehicle','member','single_way_km','double_way_km',
-        'single_total_cost','double_total_cost','tds_1_percent','maintenance',
-        'driver_salary','vehicle_maintenance','cng_gas','petrol','supervisor_commission',
-        'company_credit','total_deduction','total_profit_after_tax'
-    ]
-    writer.writerow(header)
-    for r in records:
-        writer.writerow([
-            r.id, r.month, r.vehicle.name if r.vehicle else '', r.member.name if r.member else '',
-            r.single_way_km, r.double_way_km, r.single_total_cost, r.double_total_cost,
-            r.tds_1_percent, r.maintenance, r.driver_salary, r.vehicle_maintenance,
-            r.cng_gas, r.petrol, r.supervisor_commission, r.company_credit,
-            r.total_deduction, r.total_profit_after_tax
-        ])
-    mem = BytesIO()
-    mem.write(si.getvalue().encode('utf-8'))
-    mem.seek(0)
+    writer.writerow(CSV_HEADER)
+    for i, r in enumerate(q.yield_per(CSV_CHUNK_ROWS), 1):
+        writer.writerow(_csv_row(r))
+        if i % CSV_CHUNK_ROWS == 0:
+            yield si.getvalue()
+            si.seek(0)
+            si.truncate(0)
+    yield si.getvalue()
+
+
+def _cache_stream(key, chunks):
+    """Encode and yield text (or bytes) chunks while copying them into the report cache."""
+    writer = report_cache.open_writer(key)
+    try:
+        for chunk in chunks:
+            data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            writer.write(data)
+            yield data
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
+
+
+def _export_filters():
+    """vehicle_id/month/start_month/end_month query args as fetch_records filters"""
+    return {'vehicle_id': _parse_id(request.args.get('vehicle_id')),
+            'month_like': request.args.get('month'),
+            'start_month': request.args.get('start_month'),
+            'end_month': request.args.get('end_month')}
+
+
+@app.route('/export_csv')
+def export_csv():
+    filters = _export_filters()
     filename = f"fleet_records_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-    return send_file(mem, mimetype='text/csv', download_name=filename, as_attachment=True)
+    key = report_cache.make_key('export_csv', filters, data_version())
+    cached = report_cache.open_reader(key)
+    if cached:
+        return send_file(cached, mimetype='text/csv', download_name=filename, as_attachment=True)
+    q = fetch_records(**filters)
+    return Response(
+        stream_with_context(_cache_stream(key, _stream_csv(q))),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+COLUMNAR_BATCH_ROWS = int(os.environ.get('COLUMNAR_BATCH_ROWS', '10000'))
+
+
+def _export_columnar(fmt):
+    if not columnar_export.AVAILABLE:
+        return {'error': 'pyarrow is not installed'}, 501
+    filters = _export_filters()
+    ext = 'parquet' if fmt == 'parquet' else 'arrows'
+    filename = f"fleet_records_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{ext}"
+    mimetype = columnar_export.FORMATS[fmt]
+    key = report_cache.make_key(f'export_{fmt}', filters, data_version())
+    cached = report_cache.open_reader(key)
+    if cached:
+        return send_file(cached, mimetype=mimetype, download_name=filename, as_attachment=True)
+    q = fetch_records(**filters).yield_per(COLUMNAR_BATCH_ROWS)
+    rows = (_csv_row(r) for r in q)
+    return Response(
+        stream_with_context(_cache_stream(key, columnar_export.stream_columnar(rows, fmt, COLUMNAR_BATCH_ROWS))),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+@app.route('/export_parquet')
+def export_parquet():
+    """Records as a Parquet file, one row group per COLUMNAR_BATCH_ROWS rows (filters as /export_csv)"""
+    return _export_columnar('parquet')
+
+
+@app.route('/export_arrow')
+def export_arrow():
+    """Records as an Arrow IPC stream (filters as /export_csv)"""
+    return _export_columnar('arrow')
+
+
+DELTA_HEADER = CSV_HEADER + ['change_seq', 'updated_at']
+
+
+def _delta_row(r):
+    return _csv_row(r) + [r.change_seq, r.updated_at.isoformat() if r.updated_at else '']
+
+
+def _stream_delta(q, fmt):
+    """Yield the delta export of query q as CSV or NDJSON text chunks."""
+    si = io.StringIO()
+    writer = csv.writer(si)
+    if fmt == 'csv':
+        writer.writerow(DELTA_HEADER)
+    for i, r in enumerate(q.yield_per(CSV_CHUNK_ROWS), 1):
+        if fmt == 'csv':
+            writer.writerow(_delta_row(r))
+        else:
+            si.write(json.dumps(dict(zip(DELTA_HEADER, _delta_row(r)))) + '\n')
+        if i % CSV_CHUNK_ROWS == 0:
+            yield si.getvalue()
+            si.seek(0)
+            si.truncate(0)
+    yield si.getvalue()
+
+
+@app.route('/export_delta')
+def export_delta():
+    """Records created or changed after the ?since= watermark, oldest change first.
+
+    format=csv (default) or ndjson; vehicle_id filters as in /export_csv.
+    The X-Next-Watermark header carries the since value for the next call.
+    Deleted records are not reported; consumers resync with since=0 after
+    removing a vehicle or member.
+    """
+    since = _parse_id(request.args.get('since')) or 0
+    fmt = (request.args.get('format') or 'csv').lower()
+    if fmt not in ('csv', 'ndjson'):
+        return {'error': 'format must be csv or ndjson'}, 400
+    vehicle_id = _parse_id(request.args.get('vehicle_id'))
+    # fix the upper bound first so the header matches what gets streamed
+    top = db.session.query(func.max(ExpenseRecord.change_seq)).filter(ExpenseRecord.change_seq > since)
+    if vehicle_id is not None:
+        top = top.filter(ExpenseRecord.vehicle_id == vehicle_id)
+    upto = top.scalar() or since
+    q = (fetch_records(vehicle_id=vehicle_id)
+         .filter(ExpenseRecord.change_seq > since, ExpenseRecord.change_seq <= upto)
+         .order_by(None).order_by(ExpenseRecord.change_seq, ExpenseRecord.id))
+    return Response(
+        stream_with_context(_stream_delta(q, fmt)),
+        mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        headers={'X-Next-Watermark': str(upto)}
+    )
+
+
+IMPORT_BATCH_SIZE = 1000
+
+# numeric ExpenseRecord columns read from an import row
+IMPORT_FIELDS = [
+    'single_way_km', 'double_way_km', 'single_total_cost', 'double_total_cost',
+    'tds_1_percent', 'maintenance', 'driver_salary', 'vehicle_maintenance',
+    'cng_gas', 'petrol', 'supervisor_commission', 'company_credit',
+]
+
+
+def _name_cache(model):
+    """Map name -> id for every row of Vehicle/Member (first id wins on duplicates)."""
+    cache = {}
+    for id_, name in db.session.query(model.id, model.name).order_by(model.id):
+        cache.setdefault(name, id_)
+    return cache
+
+
+def _resolve_name(model, cache, name):
+    if name not in cache:
+        obj = model(name=name)
+        db.session.add(obj)
+        db.session.flush()
+        cache[name] = obj.id
+    return cache[name]
+
+
+def import_records(lines, batch_size=None):
+    """Import expense rows from an iterable of CSV text lines.
+
+    Vehicle and member names are resolved through dictionaries loaded once
+    up front; records are written with executemany INSERTs of batch_size
+    rows. Rows without a vehicle are rejected. Commits once at the end and
+    returns a dict with created, rejected, seconds and rows_per_sec.
+    """
+    batch_size = batch_size or app.config.get('IMPORT_BATCH_SIZE', IMPORT_BATCH_SIZE)
+    started = time.perf_counter()
+    vehicles = _name_cache(Vehicle)
+    members = _name_cache(Member)
+    created = 0
+    rejected = 0
+    batch = []
+    deltas = {}
+    seq = None
+
+    def fval(row, k):
+        try:
+            return float(row.get(k) or 0)
+        except Exception:
+            return 0.0
+
+    def write(batch):
+        fill_totals(batch)
+        db.session.execute(insert(ExpenseRecord), batch)
+        rollup_deltas(batch, deltas)
+
+    for row in csv.DictReader(lines):
+        vname = (row.get('vehicle') or '').strip()
+        if not vname:
+            rejected += 1
+            continue
+        mname = (row.get('member') or '').strip()
+        rec = {name: fval(row, name) for name in IMPORT_FIELDS}
+        rec['month'] = row.get('month') or ''
+        rec['vehicle_id'] = _resolve_name(Vehicle, vehicles, vname)
+        rec['member_id'] = _resolve_name(Member, members, mname) if mname else None
+        if seq is None:
+            seq = bump_data_version()
+        rec['change_seq'] = seq
+        batch.append(rec)
+        created += 1
+        if len(batch) >= batch_size:
+            write(batch)
+            batch = []
+    if batch:
+        write(batch)
+    rollup_apply(deltas)
+    db.session.commit()
+    invalidate_vehicles()
+
+    seconds = time.perf_counter() - started
+    return {
+        'created': created,
+        'rejected': rejected,
+        'seconds': seconds,
+        'rows_per_sec': created / seconds if seconds else 0.0,
+    }
+
+
+@app.cli.command('import-csv')
+@click.argument('path')
+@click.option('--batch-size', type=int, default=None, help='Rows per INSERT batch.')
+def import_csv_command(path, batch_size):
+    """Bulk import expense records from a CSV file."""
+    with open(path, newline='', encoding='utf-8') as fh:
+        stats = import_records(fh, batch_size=batch_size)
+    print(f"Imported {stats['created']} records, rejected {stats['rejected']} "
+          f"in {stats['seconds']:.2f}s ({stats['rows_per_sec']:.0f} rows/sec)")
 
 
 @app.route('/import_csv', methods=['GET', 'POST'])
@@ -251,87 +950,21 @@ def import_csv():
         if not f:
             flash('No file uploaded', 'danger')
             return redirect(url_for('import_csv'))
-        stream = io.StringIO(f.stream.read().decode('utf-8'))
-        reader = csv.DictReader(stream)
-        created = 0
-        for row in reader:
-            # find or create vehicle
-            vname = (row.get('vehicle') or '').strip()
-            if vname:
-                vehicle = Vehicle.query.filter_by(name=vname).first()
-                if not vehicle:
-                    vehicle = Vehicle(name=vname)
-                    db.session.add(vehicle)
-                    db.session.flush()
-            else:
-                continue
-
-            mname = (row.get('member') or '').strip()
-            member = None
-            if mname:
-                member = Member.query.filter_by(name=mname).first()
-                if not member:
-                    member = Member(name=mname)
-                    db.session.add(member)
-                    db.session.flush()
-
-            def fval(k):
-                try:
-                    return float(row.get(k) or 0)
-                except Exception:
-                    return 0.0
-
-            rec = ExpenseRecord(
-                month=row.get('month') or '',
-                vehicle_id=vehicle.id,
-                member_id=member.id if member else None,
-                single_way_km=fval('single_way_km'),
-                double_way_km=fval('double_way_km'),
-                single_total_cost=fval('single_total_cost'),
-                double_total_cost=fval('double_total_cost'),
-                tds_1_percent=fval('tds_1_percent'),
-                maintenance=fval('maintenance'),
-                driver_salary=fval('driver_salary'),
-                vehicle_maintenance=fval('vehicle_maintenance'),
-                cng_gas=fval('cng_gas'),
-                petrol=fval('petrol'),
-                supervisor_commission=fval('supervisor_commission'),
-                company_credit=fval('company_credit')
-            )
-            rec.total_deduction = (
-                rec.tds_1_percent + rec.maintenance + rec.driver_salary
-                + rec.vehicle_maintenance + rec.cng_gas + rec.petrol
-                + rec.supervisor_commission
-            )
-            rec.total_profit_after_tax = rec.company_credit - rec.total_deduction
-            db.session.add(rec)
-            created += 1
-        db.session.commit()
-        flash(f'Imported {created} records', 'success')
+        # decode lazily so the upload is never held in memory as one string
+        stream = io.TextIOWrapper(f.stream, encoding='utf-8', newline='')
+        stats = import_records(stream)
+        flash(f"Imported {stats['created']} records ({stats['rows_per_sec']:.0f} rows/sec), "
+              f"rejected {stats['rejected']}", 'success')
         return redirect(url_for('index'))
 
     return render_template('import.html')
 
 
-@app.route('/report_pdf')
-def report_pdf():
-    # allow optional filters
-    vehicle_id = request.args.get('vehicle_id')
-    start_month = request.args.get('start_month')
-    end_month = request.args.get('end_month')
-    q = ExpenseRecord.query
-    if vehicle_id:
-        try:
-            q = q.filter(ExpenseRecord.vehicle_id == int(vehicle_id))
-        except Exception:
-            pass
-    if start_month:
-        q = q.filter(ExpenseRecord.month >= start_month)
-    if end_month:
-        q = q.filter(ExpenseRecord.month <= end_month)
-    records = q.order_by(ExpenseRecord.id).all()
-    mem = BytesIO()
-    c = canvas.Canvas(mem, pagesize=letter)
+def render_report_pdf(fh, vehicle_id=None, start_month=None, end_month=None):
+    """Draw the fleet expense report PDF into the binary file object fh."""
+    records = fetch_records(vehicle_id=vehicle_id, start_month=start_month,
+                            end_month=end_month).all()
+    c = canvas.Canvas(fh, pagesize=letter)
     width, height = letter
     x = 40
     y = height - 40
@@ -350,14 +983,237 @@ def report_pdf():
             c.showPage()
             y = height - 40
     c.save()
-    mem.seek(0)
+
+
+def render_vehicle_report_pdf(fh, vehicle_id, start_month=None, end_month=None):
+    """Draw the per-vehicle expense report PDF into the binary file object fh."""
+    vehicle = db.session.get(Vehicle, vehicle_id)
+    records = fetch_records(vehicle_id=vehicle_id, start_month=start_month, end_month=end_month).all()
+    c = canvas.Canvas(fh, pagesize=letter)
+    width, height = letter
+    x = 40
+    y = height - 40
+    c.setFont('Helvetica-Bold', 14)
+    c.drawString(x, y, f'Fleet Expense Report - {vehicle.name}')
+    c.setFont('Helvetica', 9)
+    y -= 20
+    header = ['ID','Month','Member','Credit','Profit']
+    c.drawString(x, y, ' | '.join(header))
+    y -= 12
+    for r in records:
+        line = f"{r.id} | {r.month} | {r.member.name if r.member else ''} | {r.company_credit:.2f} | {r.total_profit_after_tax:.2f}"
+        c.drawString(x, y, line)
+        y -= 12
+        if y < 40:
+            c.showPage()
+            y = height - 40
+    c.save()
+
+
+REPORT_RENDERERS = {
+    'report_pdf': render_report_pdf,
+    'report_pdf_vehicle': render_vehicle_report_pdf,
+}
+REPORT_DIR = os.environ.get('REPORT_DIR', os.path.join(os.getcwd(), 'reports'))
+
+
+def cached_report_pdf(kind, filters):
+    """The PDF for kind/filters, rendered into the report cache on a miss.
+
+    Returned opened for reading so a concurrent evict() cannot remove it
+    before the caller has sent or copied it.
+    """
+    key = report_cache.make_key(kind, filters, data_version())
+    cached = report_cache.open_reader(key)
+    if cached:
+        return cached
+    writer = report_cache.open_writer(key)
+    try:
+        REPORT_RENDERERS[kind](writer.fh, **filters)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit_reader()
+
+
+# Background report jobs. Job state lives in the report_job table so any
+# worker process can answer status polls and downloads; finished PDFs are
+# written under REPORT_DIR. status goes queued -> running -> done | failed.
+#
+# The process that queued a job owns it and refreshes heartbeat_at on its
+# unfinished jobs every REPORT_JOB_HEARTBEAT seconds. A queued or running
+# job whose heartbeat is older than REPORT_JOB_STALE (its process died), or
+# that has been running for longer than REPORT_RENDER_TIMEOUT, is marked
+# failed. Finished jobs and their files are purged REPORT_JOB_TTL seconds
+# after they finish.
+REPORT_JOB_TTL = int(os.environ.get('REPORT_JOB_TTL', '3600'))
+REPORT_JOB_HEARTBEAT = float(os.environ.get('REPORT_JOB_HEARTBEAT', '10'))
+REPORT_JOB_STALE = float(os.environ.get('REPORT_JOB_STALE', str(3 * REPORT_JOB_HEARTBEAT)))
+REPORT_RENDER_TIMEOUT = float(os.environ.get('REPORT_RENDER_TIMEOUT', '300'))
+_report_jobs_lock = threading.Lock()
+_report_heartbeat_pid = None
+report_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('REPORT_WORKERS', '2')))
+
+
+class ReportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    filters = db.Column(db.Text, nullable=False)  # JSON with sorted keys, so equal filters compare equal
+    filename = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    path = db.Column(db.String(1024))
+    error = db.Column(db.String(1024))
+    owner = db.Column(db.String(128))  # host:pid of the process rendering it
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+def _report_job_owner():
+    # computed per call so forked workers don't inherit the parent's pid
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _ensure_report_heartbeat():
+    global _report_heartbeat_pid
+    if _report_heartbeat_pid != os.getpid():
+        _report_heartbeat_pid = os.getpid()
+        threading.Thread(target=_report_heartbeat, args=(_report_job_owner(),),
+                         name='report-heartbeat', daemon=True).start()
+
+
+def _report_heartbeat(owner):
+    """Keep this process's unfinished jobs marked as live."""
+    while True:
+        time.sleep(REPORT_JOB_HEARTBEAT)
+        try:
+            with app.app_context():
+                ReportJob.query.filter(
+                    ReportJob.owner == owner, ReportJob.status.in_(['queued', 'running'])
+                ).update({ReportJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+        except Exception as e:
+            app.logger.warning('Report job heartbeat failed: %s', e)
+
+
+def _stale_report_jobs(now):
+    """Filter for unfinished jobs whose process died or whose render overran."""
+    return and_(ReportJob.status.in_(['queued', 'running']), or_(
+        ReportJob.heartbeat_at < now - timedelta(seconds=REPORT_JOB_STALE),
+        and_(ReportJob.status == 'running',
+             ReportJob.started_at < now - timedelta(seconds=REPORT_RENDER_TIMEOUT))
+    ))
+
+
+def fail_stale_report_jobs(now=None):
+    """Mark stale queued/running jobs failed; returns the number marked."""
+    now = now or datetime.utcnow()
+    failed = ReportJob.query.filter(_stale_report_jobs(now)).update(
+        {ReportJob.status: 'failed', ReportJob.error: 'Rendering stopped or timed out',
+         ReportJob.finished_at: now},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return failed
+
+
+def purge_report_jobs(now=None):
+    """Fail stale jobs, then delete jobs finished over REPORT_JOB_TTL ago and their PDFs.
+
+    Returns the number of jobs deleted.
+    """
+    now = now or datetime.utcnow()
+    fail_stale_report_jobs(now)
+    expired = ReportJob.query.filter(ReportJob.finished_at < now - timedelta(seconds=REPORT_JOB_TTL)).all()
+    for job in expired:
+        if job.path and os.path.exists(job.path):
+            os.remove(job.path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(expired)
+
+
+def submit_report_job(kind, filename, **filters):
+    """Queue a PDF render in the background and return its job id.
+
+    An identical request (same kind and filters) that is still queued or
+    running in a live process is shared instead of starting a second render.
+    Stale and expired jobs are cleaned up on the way.
+    """
+    filters_json = json.dumps(filters, sort_keys=True)
+    with _report_jobs_lock:
+        purge_report_jobs()
+        job = ReportJob.query.filter(ReportJob.kind == kind, ReportJob.filters == filters_json,
+                                     ReportJob.status.in_(['queued', 'running'])).first()
+        if job:
+            return job.id
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        db.session.add(ReportJob(id=job_id, kind=kind, filters=filters_json, filename=filename,
+                                 owner=_report_job_owner(), created_at=now, heartbeat_at=now))
+        db.session.commit()
+    _ensure_report_heartbeat()
+    report_executor.submit(_run_report_job, job_id)
+    return job_id
+
+
+def _run_report_job(job_id):
+    path = os.path.join(REPORT_DIR, f'{job_id}.pdf')
+    with app.app_context():
+        now = datetime.utcnow()
+        started = ReportJob.query.filter_by(id=job_id, status='queued').update(
+            {ReportJob.status: 'running', ReportJob.started_at: now, ReportJob.heartbeat_at: now},
+            synchronize_session=False
+        )
+        db.session.commit()
+        if not started:
+            return  # purged, or given up on while it waited
+        job = db.session.get(ReportJob, job_id)
+        try:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            # copy out of the cache so eviction cannot remove a pending download
+            with cached_report_pdf(job.kind, json.loads(job.filters)) as cached, \
+                    open(path + '.part', 'wb') as out:
+                shutil.copyfileobj(cached, out)
+            os.replace(path + '.part', path)
+            outcome = {'status': 'done', 'path': path}
+        except Exception as e:
+            db.session.rollback()
+            outcome = {'status': 'failed', 'error': str(e)[:1024]}
+        outcome['finished_at'] = datetime.utcnow()
+        updated = ReportJob.query.filter_by(id=job_id, status='running').update(outcome)
+        db.session.commit()
+        if not updated and os.path.exists(path):
+            # timed out or purged while rendering; nobody can download it now
+            os.remove(path)
+
+
+def _wants_async():
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def _report_job_response(job_id):
+    return {'job_id': job_id, 'status_url': url_for('report_job_status', job_id=job_id)}, 202
+
+
+@app.route('/report_pdf')
+def report_pdf():
+    # allow optional filters; ?async=1 renders in the background
+    vehicle_id = request.args.get('vehicle_id')
+    start_month = request.args.get('start_month')
+    end_month = request.args.get('end_month')
+    filters = {'vehicle_id': _parse_id(vehicle_id), 'start_month': start_month, 'end_month': end_month}
     filename = f"fleet_report_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
-    return send_file(mem, mimetype='application/pdf', download_name=filename, as_attachment=True)
+    if _wants_async():
+        return _report_job_response(submit_report_job('report_pdf', filename, **filters))
+    pdf = cached_report_pdf('report_pdf', filters)
+    return send_file(pdf, mimetype='application/pdf', download_name=filename, as_attachment=True)
 
 
 @app.route('/report_pdf_vehicle')
 def report_pdf_vehicle():
-    # per-vehicle PDF, optional date range
+    # per-vehicle PDF, optional date range; ?async=1 renders in the background
     vehicle_id = request.args.get('vehicle_id')
     start_month = request.args.get('start_month')
     end_month = request.args.get('end_month')
@@ -374,84 +1230,97 @@ def report_pdf_vehicle():
         flash('Vehicle not found', 'danger')
         return redirect(url_for('index'))
 
-    q = ExpenseRecord.query.filter(ExpenseRecord.vehicle_id == vid)
-    if start_month:
-        q = q.filter(ExpenseRecord.month >= start_month)
-    if end_month:
-        q = q.filter(ExpenseRecord.month <= end_month)
-    records = q.order_by(ExpenseRecord.id).all()
-
-    mem = BytesIO()
-    c = canvas.Canvas(mem, pagesize=letter)
-    width, height = letter
-    x = 40
-    y = height - 40
-    c.setFont('Helvetica-Bold', 14)
-    c.drawString(x, y, f'Fleet Expense Report - {vehicle.name}')
-    c.setFont('Helvetica', 9)
-    y -= 20
-    header = ['ID','Month','Member','Credit','Profit']
-    c.drawString(x, y, ' | '.join(header))
-    y -= 12
-    for r in records:
-        line = f"{r.id} | {r.month} | {r.member.name if r.member else ''} | {r.company_credit:.2f} | {r.total_profit_after_tax:.2f}"
-        c.drawString(x, y, line)
-        y -= 12
-        if y < 40:
-            c.showPage()
-            y = height - 40
-    c.save()
-    mem.seek(0)
+    filters = {'vehicle_id': vid, 'start_month': start_month, 'end_month': end_month}
     filename = f"fleet_report_{vehicle.name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
-    return send_file(mem, mimetype='application/pdf', download_name=filename, as_attachment=True)
+    if _wants_async():
+        return _report_job_response(submit_report_job('report_pdf_vehicle', filename, **filters))
+    pdf = cached_report_pdf('report_pdf_vehicle', filters)
+    return send_file(pdf, mimetype='application/pdf', download_name=filename, as_attachment=True)
+
+
+@app.route('/report_jobs/<job_id>')
+def report_job_status(job_id):
+    job = db.session.get(ReportJob, job_id)
+    if not job:
+        return {'error': 'Unknown job'}, 404
+    if job.status in ('queued', 'running') and fail_stale_report_jobs():
+        db.session.refresh(job)
+    data = {'job_id': job_id, 'status': job.status, 'error': job.error}
+    if job.status == 'done':
+        data['download_url'] = url_for('report_job_download', job_id=job_id)
+    return data
+
+
+@app.route('/report_jobs/<job_id>/download')
+def report_job_download(job_id):
+    job = db.session.get(ReportJob, job_id)
+    if not job:
+        return {'error': 'Unknown job'}, 404
+    if job.status != 'done':
+        return {'job_id': job_id, 'status': job.status, 'error': job.error}, 409
+    return send_file(job.path, mimetype='application/pdf', download_name=job.filename, as_attachment=True)
+
+
+# (label, column) pairs summed per vehicle by /api/charts, in chart order
+CHART_COLUMNS = [
+    ('Company Credit', ExpenseRollup.company_credit),
+    ('TDS (1%)', ExpenseRollup.tds_1_percent),
+    ('Maintenance', ExpenseRollup.maintenance),
+    ('Driver Salary', ExpenseRollup.driver_salary),
+    ('Vehicle Maint', ExpenseRollup.vehicle_maintenance),
+    ('CNG Gas', ExpenseRollup.cng_gas),
+    ('Petrol', ExpenseRollup.petrol),
+    ('Supervisor Comm', ExpenseRollup.supervisor_commission),
+    ('Total Deduction', ExpenseRollup.total_deduction),
+    ('Net Profit', ExpenseRollup.total_profit_after_tax),
+]
 
 
 @app.route('/api/charts')
 def charts_api():
     """API endpoint for chart data - returns profit/loss data for each vehicle"""
-    vehicles = Vehicle.query.all()
+    # optional filters: exact month, or start/end range (format YYYY-MM)
+    month = request.args.get('month')
+    start_month = request.args.get('start_month')
+    end_month = request.args.get('end_month')
+
+    join_on = [ExpenseRollup.vehicle_id == Vehicle.id]
+    if month:
+        join_on.append(ExpenseRollup.month == month)
+    if start_month:
+        join_on.append(ExpenseRollup.month >= start_month)
+    if end_month:
+        join_on.append(ExpenseRollup.month <= end_month)
+
+    # One grouped query over the rollup; the filters sit in the join so
+    # vehicles without matching records still come back with zero totals.
+    sums = [func.coalesce(func.sum(col), 0.0) for _, col in CHART_COLUMNS]
+    count = func.coalesce(func.sum(ExpenseRollup.record_count), 0)
+    rows = (
+        db.session.query(Vehicle.id, Vehicle.name, count, *sums)
+        .outerjoin(ExpenseRollup, and_(*join_on))
+        .group_by(Vehicle.id, Vehicle.name)
+        .order_by(Vehicle.id)
+        .all()
+    )
+
+    labels = [label for label, _ in CHART_COLUMNS]
     chart_data = {}
-    
-    for v in vehicles:
-        records = ExpenseRecord.query.filter_by(vehicle_id=v.id).all()
-        
-        # Calculate totals
-        company_credit = sum(r.company_credit or 0 for r in records)
-        tds = sum(r.tds_1_percent or 0 for r in records)
-        maintenance = sum(r.maintenance or 0 for r in records)
-        driver_salary = sum(r.driver_salary or 0 for r in records)
-        vehicle_maint = sum(r.vehicle_maintenance or 0 for r in records)
-        cng_gas = sum(r.cng_gas or 0 for r in records)
-        petrol = sum(r.petrol or 0 for r in records)
-        supervisor_comm = sum(r.supervisor_commission or 0 for r in records)
-        total_deduction = sum(r.total_deduction or 0 for r in records)
-        total_profit = sum(r.total_profit_after_tax or 0 for r in records)
-        
-        chart_data[f'vehicle_{v.id}'] = {
-            'id': v.id,
-            'name': v.name,
-            'labels': ['Company Credit', 'TDS (1%)', 'Maintenance', 'Driver Salary', 
-                      'Vehicle Maint', 'CNG Gas', 'Petrol', 'Supervisor Comm', 'Total Deduction', 'Net Profit'],
-            'data': [
-                round(company_credit, 2),
-                round(tds, 2),
-                round(maintenance, 2),
-                round(driver_salary, 2),
-                round(vehicle_maint, 2),
-                round(cng_gas, 2),
-                round(petrol, 2),
-                round(supervisor_comm, 2),
-                round(total_deduction, 2),
-                round(total_profit, 2)
-            ],
+    for vid, name, count, *totals in rows:
+        data = [round(t, 2) for t in totals]
+        chart_data[f'vehicle_{vid}'] = {
+            'id': vid,
+            'name': name,
+            'labels': labels,
+            'data': data,
             'summary': {
-                'total_credit': round(company_credit, 2),
-                'total_deduction': round(total_deduction, 2),
-                'total_profit': round(total_profit, 2),
-                'record_count': len(records)
+                'total_credit': data[0],
+                'total_deduction': data[8],
+                'total_profit': data[9],
+                'record_count': count
             }
         }
-    
+
     return {'vehicles': chart_data}
 
 
@@ -465,25 +1334,78 @@ def _get_prev_month():
     return f"{year}-{month:02d}"
 
 
-def compose_monthly_summary(month=None):
+def _monthly_vehicle_totals(month):
+    """(vehicle name, record count, credit, deduction, profit) for vehicles with records in month."""
+    return (
+        db.session.query(
+            Vehicle.name,
+            func.sum(ExpenseRollup.record_count),
+            func.sum(ExpenseRollup.company_credit),
+            func.sum(ExpenseRollup.total_deduction),
+            func.sum(ExpenseRollup.total_profit_after_tax),
+        )
+        .join(ExpenseRollup, ExpenseRollup.vehicle_id == Vehicle.id)
+        .filter(ExpenseRollup.month == month)
+        .group_by(Vehicle.id, Vehicle.name)
+        .having(func.sum(ExpenseRollup.record_count) > 0)
+        .order_by(Vehicle.id)
+        .all()
+    )
+
+
+def fetch_month_snapshot(month):
+    """Every record of month as a plain tuple, from one query with names joined.
+
+    Returns (rows, by_vehicle): rows are in CSV_HEADER order, sorted by id;
+    by_vehicle maps vehicle_id -> (vehicle name, rows) in vehicle id order.
+    """
+    columns = [ExpenseRecord.id, ExpenseRecord.month, func.coalesce(Vehicle.name, ''),
+               func.coalesce(Member.name, '')] + [getattr(ExpenseRecord, name) for name in CSV_HEADER[4:]]
+    q = (
+        db.session.query(ExpenseRecord.vehicle_id, *columns)
+        .outerjoin(Vehicle, ExpenseRecord.vehicle_id == Vehicle.id)
+        .outerjoin(Member, ExpenseRecord.member_id == Member.id)
+        .filter(ExpenseRecord.month == month)
+        .order_by(ExpenseRecord.id)
+    )
+    rows = []
+    by_vehicle = {}
+    for vehicle_id, *row in q:
+        row = tuple(row)
+        rows.append(row)
+        by_vehicle.setdefault(vehicle_id, (row[2], []))[1].append(row)
+    return rows, dict(sorted(by_vehicle.items()))
+
+
+def _snapshot_vehicle_totals(by_vehicle):
+    """Same shape as _monthly_vehicle_totals, computed from a month snapshot."""
+    credit = CSV_HEADER.index('company_credit')
+    deduction = CSV_HEADER.index('total_deduction')
+    profit = CSV_HEADER.index('total_profit_after_tax')
+    return [
+        (name, len(rows), sum(r[credit] or 0 for r in rows),
+         sum(r[deduction] or 0 for r in rows), sum(r[profit] or 0 for r in rows))
+        for name, rows in by_vehicle.values()
+    ]
+
+
+def compose_monthly_summary(month=None, by_vehicle=None):
+    """Summary email body for month; pass a snapshot's by_vehicle to avoid re-querying."""
     if not month:
         month = _get_prev_month()
-    vehicles = Vehicle.query.all()
+    if by_vehicle is None:
+        vehicle_totals = _monthly_vehicle_totals(month)
+    else:
+        vehicle_totals = _snapshot_vehicle_totals(by_vehicle)
     total_credit = 0.0
     total_deduction = 0.0
     total_profit = 0.0
     per_vehicle = []
-    for v in vehicles:
-        recs = ExpenseRecord.query.filter(ExpenseRecord.vehicle_id == v.id, ExpenseRecord.month == month).all()
-        if not recs:
-            continue
-        vc = sum((r.company_credit or 0) for r in recs)
-        vd = sum((r.total_deduction or 0) for r in recs)
-        vp = sum((r.total_profit_after_tax or 0) for r in recs)
+    for name, cnt, vc, vd, vp in vehicle_totals:
         total_credit += vc
         total_deduction += vd
         total_profit += vp
-        per_vehicle.append((v.name, vc, vd, vp, len(recs)))
+        per_vehicle.append((name, vc, vd, vp, cnt))
 
     lines = [f"Fleet Monthly Summary for {month}", "", f"Total Company Credit: {total_credit:.2f}", f"Total Deductions: {total_deduction:.2f}", f"Total Profit After Tax: {total_profit:.2f}", "", "Per vehicle:"]
     for name, vc, vd, vp, cnt in per_vehicle:
@@ -494,19 +1416,50 @@ def compose_monthly_summary(month=None):
     return month, body
 
 
+# In-process copy of the Setting table. set_settings() clears it; the TTL
+# bounds how long other worker processes can serve a stale value.
+SETTINGS_CACHE_TTL = float(os.environ.get('SETTINGS_CACHE_TTL', '30'))
+_settings_cache = None
+_settings_loaded_at = 0.0
+
+
+def _load_settings():
+    global _settings_cache, _settings_loaded_at
+    cache = _settings_cache
+    if cache is None or time.monotonic() - _settings_loaded_at > SETTINGS_CACHE_TTL:
+        cache = dict(db.session.query(Setting.key, Setting.value).all())
+        _settings_cache = cache
+        _settings_loaded_at = time.monotonic()
+    return cache
+
+
+def invalidate_settings():
+    global _settings_cache
+    _settings_cache = None
+
+
 def get_setting(key, default=None):
-    s = Setting.query.filter_by(key=key).first()
-    return s.value if s else os.environ.get(key) or default
+    settings = _load_settings()
+    if key in settings:
+        return settings[key]
+    return os.environ.get(key) or default
+
+
+def set_settings(values):
+    """Write several settings in one transaction."""
+    existing = {s.key: s for s in Setting.query.filter(Setting.key.in_(list(values))).all()}
+    for key, value in values.items():
+        s = existing.get(key)
+        if not s:
+            db.session.add(Setting(key=key, value=value))
+        else:
+            s.value = value
+    db.session.commit()
+    invalidate_settings()
 
 
 def set_setting(key, value):
-    s = Setting.query.filter_by(key=key).first()
-    if not s:
-        s = Setting(key=key, value=value)
-        db.session.add(s)
-    else:
-        s.value = value
-    db.session.commit()
+    set_settings({key: value})
 
 
 def _attach_file_to_msg(msg, filename, data, mimetype):
@@ -520,18 +1473,39 @@ def _attach_file_to_msg(msg, filename, data, mimetype):
     msg.attach(part)
 
 
-def send_email(subject, body, recipients, attachments=None):
+_mailer = None
+_mailer_config = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer():
+    """Shared Mailer for the current SMTP settings, or None if SMTP_HOST is not set.
+
+    The mailer keeps one authenticated connection open across messages and
+    is replaced when the SMTP settings change.
+    """
+    global _mailer, _mailer_config
+    config = (
+        get_setting('SMTP_HOST'),
+        int(get_setting('SMTP_PORT', '587')),
+        get_setting('SMTP_USER'),
+        get_setting('SMTP_PASS'),
+        (get_setting('SMTP_STARTTLS') or '1').lower() not in ('0', 'false', 'no'),
+    )
+    with _mailer_lock:
+        if config != _mailer_config:
+            if _mailer:
+                _mailer.close()
+            host, port, user, password, starttls = config
+            _mailer = Mailer(host, port, user, password, starttls=starttls) if host else None
+            _mailer_config = config
+        return _mailer
+
+
+def build_email(subject, body, recipients, attachments=None):
     # attachments: list of tuples (filename, bytes, mimetype)
-    smtp_host = get_setting('SMTP_HOST')
-    smtp_port = int(get_setting('SMTP_PORT', '587'))
-    smtp_user = get_setting('SMTP_USER')
-    smtp_pass = get_setting('SMTP_PASS')
-    email_from = get_setting('EMAIL_FROM') or smtp_user
-    if not smtp_host or not recipients:
-        return False, 'SMTP_HOST or recipients not configured'
-
     msg = MIMEMultipart()
-    msg['From'] = email_from
+    msg['From'] = get_setting('EMAIL_FROM') or get_setting('SMTP_USER')
     msg['To'] = ', '.join(recipients)
     msg['Subject'] = subject
     msg.attach(MIMEText(body, 'plain'))
@@ -539,41 +1513,53 @@ def send_email(subject, body, recipients, attachments=None):
     if attachments:
         for filename, data, mimetype in attachments:
             _attach_file_to_msg(msg, filename, data, mimetype)
+    return msg
 
-    try:
-        server = smtplib.SMTP(smtp_host, smtp_port, timeout=30)
-        server.starttls()
-        if smtp_user and smtp_pass:
-            server.login(smtp_user, smtp_pass)
-        server.sendmail(email_from, recipients, msg.as_string())
-        server.quit()
-        return True, 'Email sent'
-    except Exception as e:
-        return False, str(e)
+
+def send_emails(messages):
+    """Send many emails through the shared mailer's outbox.
+
+    messages: list of (subject, body, recipients, attachments) tuples.
+    Returns a list of (ok, info) results in the same order.
+    """
+    mailer = get_mailer()
+    email_from = get_setting('EMAIL_FROM') or get_setting('SMTP_USER')
+    pending = []
+    for subject, body, recipients, attachments in messages:
+        if not mailer or not recipients:
+            pending.append((False, 'SMTP_HOST or recipients not configured'))
+            continue
+        msg = build_email(subject, body, recipients, attachments)
+        pending.append(mailer.enqueue(email_from, recipients, msg.as_string()))
+    return [p if isinstance(p, tuple) else p.result() for p in pending]
+
+
+def send_email(subject, body, recipients, attachments=None):
+    return send_emails([(subject, body, recipients, attachments)])[0]
+
+
+# processes used to lay out the combined monthly PDF (1 = in-process)
+COMBINED_PDF_WORKERS = int(os.environ.get('COMBINED_PDF_WORKERS', '1'))
 
 
 def send_monthly_summary_job(month=None):
-    month, body = compose_monthly_summary(month)
+    if not month:
+        month = _get_prev_month()
     recipients_setting = get_setting('EMAIL_TO')
     if not recipients_setting:
         return False, 'EMAIL_TO not set'
     recipients = [r.strip() for r in recipients_setting.split(',') if r.strip()]
     subject = f'Fleet Monthly Summary - {month}'
 
-    # Build CSV attachment (all records for month)
+    # One fetch of the month feeds the summary, the CSV and the PDF, so all three agree
+    rows, by_vehicle = fetch_month_snapshot(month)
+    month, body = compose_monthly_summary(month, by_vehicle)
+
+    # Build CSV (all records for month)
     si = io.StringIO()
     writer = csv.writer(si)
-    header = ['id','month','vehicle','member','single_way_km','double_way_km','single_total_cost','double_total_cost','tds_1_percent','maintenance','driver_salary','vehicle_maintenance','cng_gas','petrol','supervisor_commission','company_credit','total_deduction','total_profit_after_tax']
-    writer.writerow(header)
-    recs = ExpenseRecord.query.filter(ExpenseRecord.month == month).order_by(ExpenseRecord.id).all()
-    for r in recs:
-        writer.writerow([
-            r.id, r.month, r.vehicle.name if r.vehicle else '', r.member.name if r.member else '',
-            r.single_way_km, r.double_way_km, r.single_total_cost, r.double_total_cost,
-            r.tds_1_percent, r.maintenance, r.driver_salary, r.vehicle_maintenance,
-            r.cng_gas, r.petrol, r.supervisor_commission, r.company_credit,
-            r.total_deduction, r.total_profit_after_tax
-        ])
+    writer.writerow(CSV_HEADER)
+    writer.writerows(rows)
     csv_bytes = si.getvalue().encode('utf-8')
 
     # Save CSV to exports/ for record-keeping (do not attach to email)
@@ -587,40 +1573,15 @@ def send_monthly_summary_job(month=None):
         pass
 
     # Build a single combined PDF for all vehicles
-    vehicles = Vehicle.query.all()
+    credit = CSV_HEADER.index('company_credit')
+    profit = CSV_HEADER.index('total_profit_after_tax')
+    sections = [
+        (name, [(r[0], r[1], r[3], r[credit], r[profit]) for r in v_rows])
+        for name, v_rows in by_vehicle.values()
+    ]
     mem_pdf = BytesIO()
-    c = canvas.Canvas(mem_pdf, pagesize=letter)
-    width, height = letter
-    x = 40
-    y = height - 40
-    c.setFont('Helvetica-Bold', 16)
-    c.drawString(x, y, f'Fleet Combined Expense Report - {month}')
-    c.setFont('Helvetica', 9)
-    y -= 24
-    for v in vehicles:
-        v_recs = ExpenseRecord.query.filter(ExpenseRecord.vehicle_id == v.id, ExpenseRecord.month == month).order_by(ExpenseRecord.id).all()
-        if not v_recs:
-            continue
-        c.setFont('Helvetica-Bold', 12)
-        c.drawString(x, y, f'Vehicle: {v.name} (records: {len(v_recs)})')
-        y -= 14
-        c.setFont('Helvetica', 9)
-        c.drawString(x, y, 'ID | Month | Member | Credit | Profit')
-        y -= 12
-        for r in v_recs:
-            line = f"{r.id} | {r.month} | {r.member.name if r.member else ''} | {r.company_credit:.2f} | {r.total_profit_after_tax:.2f}"
-            c.drawString(x, y, line)
-            y -= 12
-            if y < 60:
-                c.showPage()
-                y = height - 40
-        y -= 10
-        if y < 60:
-            c.showPage()
-            y = height - 40
-    c.save()
-    mem_pdf.seek(0)
-    pdf_bytes = mem_pdf.read()
+    render_combined_pdf(mem_pdf, month, sections, workers=COMBINED_PDF_WORKERS)
+    pdf_bytes = mem_pdf.getvalue()
 
     # Attach only the combined PDF (no CSV)
     attachments = [
@@ -641,20 +1602,181 @@ def send_summary():
     return redirect(url_for('index'))
 
 
-# Start scheduler to run monthly on the 1st at 00:05 UTC
-scheduler = BackgroundScheduler()
-scheduler.add_job(lambda: send_monthly_summary_job(), 'cron', day='1', hour='0', minute='5')
-scheduler.start()
+# Scheduler. Jobs live in the database (apscheduler_jobs table) so a run
+# missed while the app was down is caught up on restart. Only the process
+# holding the 'scheduler' lease runs them; start_scheduler() must be
+# called explicitly (see __main__ and 'flask scheduler').
+
+SCHEDULER_LEASE = 'scheduler'
+SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', '60'))
+SCHEDULER_MISFIRE_GRACE = int(os.environ.get('SCHEDULER_MISFIRE_GRACE', str(3 * 24 * 3600)))
+SCHEDULER_OWNER = None  # set by start_scheduler(), after any worker fork
+
+scheduler = None
+_scheduler_thread = None
+
+
+class SchedulerLease(db.Model):
+    name = db.Column(db.String(64), primary_key=True)
+    owner = db.Column(db.String(128), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class JobRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(64), nullable=False, index=True)
+    owner = db.Column(db.String(128))
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    duration_seconds = db.Column(db.Float)
+    status = db.Column(db.String(16), default='running')  # running, success, failed
+    message = db.Column(db.String(1024))
+
+
+def acquire_lease(name, owner, seconds):
+    """Take or renew the named lease for owner; False if another owner holds it."""
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=seconds)
+    renewed = SchedulerLease.query.filter(
+        SchedulerLease.name == name,
+        or_(SchedulerLease.owner == owner, SchedulerLease.expires_at < now)
+    ).update({SchedulerLease.owner: owner, SchedulerLease.expires_at: expires}, synchronize_session=False)
+    if renewed:
+        db.session.commit()
+        return True
+    if db.session.get(SchedulerLease, name) is not None:
+        db.session.rollback()
+        return False
+    try:
+        db.session.add(SchedulerLease(name=name, owner=owner, expires_at=expires))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def run_recorded(job_id, func, *args):
+    """Run func(*args) -> (ok, message) and record the outcome in JobRun.
+
+    Nothing runs unless this process still holds the scheduler lease; the
+    supervisor may not have noticed yet that another process took it over.
+    """
+    with app.app_context():
+        try:
+            leader = acquire_lease(SCHEDULER_LEASE, SCHEDULER_OWNER, SCHEDULER_LEASE_SECONDS)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning('Skipping %s: could not confirm the scheduler lease: %s', job_id, e)
+            return
+        if not leader:
+            app.logger.warning('Skipping %s: %s no longer holds the scheduler lease', job_id, SCHEDULER_OWNER)
+            return
+        run = JobRun(job_id=job_id, owner=SCHEDULER_OWNER, started_at=datetime.utcnow(), status='running')
+        db.session.add(run)
+        db.session.commit()
+        started = time.perf_counter()
+        try:
+            ok, message = func(*args)
+            run.status = 'success' if ok else 'failed'
+            run.message = str(message)[:1024]
+        except Exception as e:
+            db.session.rollback()
+            run.status = 'failed'
+            run.message = str(e)[:1024]
+        run.finished_at = datetime.utcnow()
+        run.duration_seconds = time.perf_counter() - started
+        db.session.commit()
+
+
+def scheduled_monthly_summary():
+    run_recorded('monthly_summary', send_monthly_summary_job)
+
+
+def _build_scheduler():
+    sched = BackgroundScheduler(
+        jobstores={'default': SQLAlchemyJobStore(engine=db.engine)},
+        job_defaults={'coalesce': True, 'misfire_grace_time': SCHEDULER_MISFIRE_GRACE},
+        timezone='UTC'
+    )
+    sched.start(paused=True)
+    # keep an existing job so its stored next run time (and any missed run) survives restarts
+    if sched.get_job('monthly_summary') is None:
+        # monthly on the 1st at 00:05 UTC
+        sched.add_job('app:scheduled_monthly_summary', 'cron', id='monthly_summary',
+                      day='1', hour='0', minute='5')
+    sched.resume()
+    return sched
+
+
+def _supervise_scheduler():
+    """Hold the scheduler lease and run the scheduler only while holding it."""
+    global scheduler
+    interval = SCHEDULER_LEASE_SECONDS / 3
+    renewed_at = None
+    while True:
+        try:
+            with app.app_context():
+                leader = acquire_lease(SCHEDULER_LEASE, SCHEDULER_OWNER, SCHEDULER_LEASE_SECONDS)
+            renewed_at = time.monotonic() if leader else None
+        except Exception as e:
+            app.logger.warning('Scheduler supervisor error: %s', e)
+            # keep the scheduler through a failed renewal only while the lease
+            # is sure to outlast the next attempt
+            if renewed_at is not None and time.monotonic() - renewed_at + interval >= SCHEDULER_LEASE_SECONDS:
+                renewed_at = None
+        if renewed_at is not None and scheduler is None:
+            try:
+                with app.app_context():
+                    scheduler = _build_scheduler()
+            except Exception as e:
+                app.logger.warning('Scheduler start failed: %s', e)
+        elif renewed_at is None and scheduler is not None:
+            scheduler.shutdown(wait=False)
+            scheduler = None
+        time.sleep(interval)
+
+
+def start_scheduler():
+    """Start competing for the scheduler lease in a background thread (idempotent)."""
+    global _scheduler_thread, SCHEDULER_OWNER
+    if _scheduler_thread is None:
+        SCHEDULER_OWNER = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        _scheduler_thread = threading.Thread(target=_supervise_scheduler, name='scheduler-supervisor', daemon=True)
+        _scheduler_thread.start()
+
+
+@app.cli.command('scheduler')
+def scheduler_command():
+    """Run the job scheduler in the foreground."""
+    with app.app_context():
+        migrate_db()
+    start_scheduler()
+    print(f'Scheduler started as {SCHEDULER_OWNER}; Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+@app.route('/api/job_runs')
+def job_runs_api():
+    """Most recent scheduled job runs, newest first"""
+    runs = JobRun.query.order_by(JobRun.id.desc()).limit(50).all()
+    return {'runs': [{
+        'id': r.id, 'job_id': r.job_id, 'owner': r.owner, 'status': r.status, 'message': r.message,
+        'started_at': r.started_at.isoformat() if r.started_at else None,
+        'finished_at': r.finished_at.isoformat() if r.finished_at else None,
+        'duration_seconds': r.duration_seconds,
+    } for r in runs]}
 
 
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
     if request.method == 'POST':
-        for key in ['SMTP_HOST','SMTP_PORT','SMTP_USER','SMTP_PASS','EMAIL_FROM','EMAIL_TO']:
-            val = request.form.get(key)
-            if val is None:
-                val = ''
-            set_setting(key, val)
+        set_settings({key: request.form.get(key) or ''
+                      for key in ['SMTP_HOST','SMTP_PORT','SMTP_USER','SMTP_PASS','EMAIL_FROM','EMAIL_TO']})
         flash('Settings saved', 'success')
         return redirect(url_for('settings'))
 
@@ -665,10 +1787,14 @@ def settings():
 
 
 if __name__ == '__main__':
-    # ensure DB exists
-    if not os.path.exists('expenses.db'):
-        with app.app_context():
-            db.create_all()
+    # stored jobs reference 'app:<function>'; resolve that to this module
+    # rather than letting the scheduler import a second copy of it
+    sys.modules.setdefault('app', sys.modules[__name__])
+
+    # ensure DB exists and is up to date
+    with app.app_context():
+        migrate_db()
+    start_scheduler()
     
     # Generate SSL certificate if it doesn't exist
     if not os.path.exists('cert.pem') or not os.path.exists('key.pem'):
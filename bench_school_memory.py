@@ -0,0 +1,143 @@
+"""
+School Memory Benchmark
+Measures bytes allocated per entity (tracemalloc) for the slotted models
+against the previous __dict__-based classes, for each entity type, then per
+enrolled student with the enrollment links on both sides counted: the old
+classes' courses/students lists against the slotted classes' link dicts.
+
+Usage: python bench_school_memory.py [--count 20000] [--enrollments 5]
+"""
+
+import argparse
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from models import Student, Teacher, Staff, Course, Classroom
+
+
+# The entity classes as they were before __slots__
+class DictPerson:
+    def __init__(self, name, email, phone, address):
+        self.id = str(uuid.uuid4())[:8]
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.address = address
+        self.created_at = datetime.now()
+
+
+class DictStudent(DictPerson):
+    def __init__(self, name, email, phone, address, grade, enrollment_date):
+        super().__init__(name, email, phone, address)
+        self.grade = grade
+        self.enrollment_date = enrollment_date
+        self.courses = []
+        self.grades = {}
+
+
+class DictTeacher(DictPerson):
+    def __init__(self, name, email, phone, address, subject, salary):
+        super().__init__(name, email, phone, address)
+        self.subject = subject
+        self.salary = salary
+        self.courses = []
+
+
+class DictStaff(DictPerson):
+    def __init__(self, name, email, phone, address, department, position, salary):
+        super().__init__(name, email, phone, address)
+        self.department = department
+        self.position = position
+        self.salary = salary
+
+
+class DictCourse:
+    def __init__(self, name, code, description, credits, teacher=None):
+        self.id = str(uuid.uuid4())[:8]
+        self.name = name
+        self.code = code
+        self.description = description
+        self.credits = credits
+        self.teacher = teacher
+        self.students = []
+
+
+class DictClassroom:
+    def __init__(self, room_number, capacity, building):
+        self.id = str(uuid.uuid4())[:8]
+        self.room_number = room_number
+        self.capacity = capacity
+        self.building = building
+        self.schedule = []
+
+
+# entity name -> (old class, new class, constructor args); shared strings so only the objects are measured
+CASES = [
+    ('Student', DictStudent, Student, ('Name', 'name@school.com', '555-0100', 'Main St', '10A', '2024-01-15')),
+    ('Teacher', DictTeacher, Teacher, ('Name', 'name@school.com', '555-0100', 'Main St', 'Math', 50000.0)),
+    ('Staff', DictStaff, Staff, ('Name', 'name@school.com', '555-0100', 'Main St', 'Admin', 'Clerk', 30000.0)),
+    ('Course', DictCourse, Course, ('Algebra', 'MATH101', 'Intro', 3)),
+    ('Classroom', DictClassroom, Classroom, ('101', 30, 'Main')),
+]
+
+
+def bytes_per_entity(cls, args, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entities = [cls(*args) for _ in range(count)]
+    total = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del entities
+    return total / count
+
+
+def dict_enroll(student, course):
+    # what Student.add_course/Course.add_student did before the link dicts
+    if course not in student.courses:
+        student.courses.append(course)
+    if student not in course.students:
+        course.students.append(student)
+
+
+def bytes_per_enrolled_student(student_cls, course_cls, enroll, enrollments, count):
+    """Bytes per student, including every list/dict entry its enrollments add on either side"""
+    courses = [course_cls('Algebra', 'MATH101', 'Intro', 3) for _ in range(100)]
+    args = CASES[0][3]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    students = []
+    for i in range(count):
+        student = student_cls(*args)
+        for j in range(enrollments):
+            enroll(student, courses[(i + j * 7) % len(courses)])
+        students.append(student)
+    total = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del students, courses
+    return total / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--enrollments', type=int, default=5, help='courses per student')
+    args = parser.parse_args()
+
+    print(f'Bytes per entity over {args.count} instances (includes the holding list)')
+    print(f"{'entity':<12}{'dict':>10}{'slots':>10}{'saved':>10}{'saved %':>10}")
+    for name, old, new, ctor_args in CASES:
+        before = bytes_per_entity(old, ctor_args, args.count)
+        after = bytes_per_entity(new, ctor_args, args.count)
+        saved = before - after
+        print(f'{name:<12}{before:>10.0f}{after:>10.0f}{saved:>10.0f}{saved / before * 100:>9.0f}%')
+
+    before = bytes_per_enrolled_student(DictStudent, DictCourse, dict_enroll, args.enrollments, args.count)
+    after = bytes_per_enrolled_student(Student, Course, Student.add_course, args.enrollments, args.count)
+    saved = before - after
+    print(f'\nBytes per student with {args.enrollments} enrollments (links on both sides included)')
+    print(f'{"enrolled":<12}{before:>10.0f}{after:>10.0f}{saved:>10.0f}{saved / before * 100:>9.0f}%')
+
+
+if __name__ == '__main__':
+    main()
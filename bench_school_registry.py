@@ -0,0 +1,73 @@
+"""
+School Registry Benchmark
+Times School lookups and removals on the id-keyed registry against the
+old list-backed School (linear next() scans, removal by rebuilding the list).
+
+Usage: python bench_school_registry.py [--sizes 10000 100000] [--ops 500]
+"""
+
+import argparse
+import random
+import time
+
+from models import School, Student
+
+
+class ListSchool:
+    """The list-backed student registry School used before it was keyed by id"""
+
+    def __init__(self):
+        self.students = []
+
+    def add_student(self, student):
+        self.students.append(student)
+
+    def remove_student(self, student_id):
+        self.students = [s for s in self.students if s.id != student_id]
+
+    def get_student(self, student_id):
+        return next((s for s in self.students if s.id == student_id), None)
+
+
+def make_students(n):
+    return [Student(f'Student {i}', f's{i}@school.com', '555-0100', 'Main St', '10A', '2024-01-15')
+            for i in range(n)]
+
+
+def timed(fn, args):
+    started = time.perf_counter()
+    for a in args:
+        fn(a)
+    return time.perf_counter() - started
+
+
+def measure(school, students, ops):
+    load = timed(school.add_student, students)
+    # ids are fixed up on collision when added, so sample after loading
+    ids = [s.id for s in random.sample(students, ops)]
+    get = timed(school.get_student, ids)
+    remove = timed(school.remove_student, ids)
+    return load, get, remove
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--ops', type=int, default=500, help='lookups and removals per run')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    print(f'{args.ops} lookups then {args.ops} removals of random students')
+    print(f"{'students':>10}{'registry':>10}{'load ms':>10}{'get us/op':>12}{'remove us/op':>14}")
+    for n in args.sizes:
+        students = make_students(n)
+        ops = min(args.ops, n)
+        for label, school in (('list', ListSchool()), ('dict', School('Bench', 'Main St'))):
+            load, get, remove = measure(school, students, ops)
+            print(f'{n:>10}{label:>10}{load * 1000:>10.1f}'
+                  f'{get / ops * 1e6:>12.1f}{remove / ops * 1e6:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
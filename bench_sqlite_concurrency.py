@@ -0,0 +1,118 @@
+"""
+SQLite Concurrency Benchmark
+Measures /api/charts read latency while a bulk CSV import is running,
+once with SQLite's default settings and once with the WAL profile.
+
+Usage: python bench_sqlite_concurrency.py [--readers 8] [--rows 100000]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def run_child(readers, rows):
+    """Run one measurement in this process (profile and database come from the environment)"""
+    import app as fleet
+
+    with fleet.app.app_context():
+        fleet.migrate_db()
+        for i in range(20):
+            fleet.db.session.add(fleet.Vehicle(name=f'Car {i}'))
+        fleet.db.session.commit()
+
+    data = io.StringIO()
+    writer = csv.writer(data)
+    writer.writerow(['month', 'vehicle', 'member', 'company_credit', 'petrol', 'driver_salary'])
+    for i in range(rows):
+        writer.writerow([f'2024-{i % 12 + 1:02d}', f'Car {i % 20}', f'Driver {i % 7}', 1000, 50, 300])
+    data.seek(0)
+
+    done = threading.Event()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def do_import():
+        with fleet.app.app_context():
+            fleet.import_records(data, batch_size=500)
+        done.set()
+
+    def read_charts():
+        client = fleet.app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            try:
+                response = client.get('/api/charts')
+                error = None if response.status_code == 200 else f'HTTP {response.status_code}'
+            except Exception as e:
+                error = str(e)
+            elapsed = time.perf_counter() - started
+            with lock:
+                if error is None:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(error)
+
+    threads = [threading.Thread(target=read_charts) for _ in range(readers)]
+    importer = threading.Thread(target=do_import)
+    started = time.perf_counter()
+    importer.start()
+    for t in threads:
+        t.start()
+    importer.join()
+    import_seconds = time.perf_counter() - started
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    print(json.dumps({
+        'requests': len(latencies),
+        'errors': len(errors),
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else None,
+        'max_ms': latencies[-1] * 1000 if latencies else None,
+        'import_seconds': import_seconds,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.readers, args.rows)
+        return
+
+    print(f'{args.readers} readers on /api/charts during a {args.rows}-row import')
+    print(f"{'profile':<10}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'import s':>10}")
+    for profile in ('default', 'wal'):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                       SQLITE_PROFILE=profile,
+                       REPORT_CACHE_DIR=os.path.join(tmp, 'cache'))
+            out = subprocess.run(
+                [sys.executable, __file__, '--child', '--readers', str(args.readers), '--rows', str(args.rows)],
+                env=env, capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        fmt = lambda v: f'{v:.1f}' if v is not None else '-'
+        print(f"{profile:<10}{r['requests']:>10}{r['errors']:>8}{fmt(r['p50_ms']):>10}"
+              f"{fmt(r['p95_ms']):>10}{fmt(r['max_ms']):>10}{r['import_seconds']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
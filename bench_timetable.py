@@ -0,0 +1,79 @@
+"""
+Timetable Benchmark
+Builds synthetic schools and times the timetable solver on them. Courses
+come in grade blocks of ten; each student takes five courses of their
+block, each teacher teaches four courses, and there are a quarter more
+rooms than a full week of slots strictly needs.
+
+Usage: python bench_timetable.py [--sizes 50 500 5000] [--budget 30] [--sessions 3]
+"""
+
+import argparse
+import math
+import random
+import time
+
+from models import School, Student, Teacher, Course, Classroom
+from timetable import TimetableSolver, find_violations, weekly_slots
+
+BLOCK_COURSES = 10
+COURSES_PER_STUDENT = 5
+STUDENTS_PER_BLOCK = 60
+COURSES_PER_TEACHER = 4
+ROOM_CAPACITIES = (30, 40, 50, 60)
+
+
+def synthetic_school(n_courses, n_slots, sessions, rng):
+    school = School(f'Synthetic {n_courses}', 'Main St')
+    courses = [Course(f'Course {i}', f'C{i}', '', 3) for i in range(n_courses)]
+    for course in courses:
+        school.add_course(course)
+
+    for t in range(math.ceil(n_courses / COURSES_PER_TEACHER)):
+        teacher = Teacher(f'Teacher {t}', f't{t}@school.com', '555-0200', 'Main St', 'General', 50000)
+        school.add_teacher(teacher)
+        for course in courses[t::math.ceil(n_courses / COURSES_PER_TEACHER)][:COURSES_PER_TEACHER]:
+            course.assign_teacher(teacher)
+
+    for b in range(0, n_courses, BLOCK_COURSES):
+        block = courses[b:b + BLOCK_COURSES]
+        for i in range(STUDENTS_PER_BLOCK):
+            student = Student(f'Student {b}-{i}', f's{b}-{i}@school.com', '555-0100', 'Main St',
+                              f'Block {b // BLOCK_COURSES}', '2024-09-01')
+            school.add_student(student)
+            for course in rng.sample(block, min(COURSES_PER_STUDENT, len(block))):
+                course.add_student(student)
+
+    n_rooms = math.ceil(n_courses * sessions / n_slots * 1.25)
+    for r in range(n_rooms):
+        school.add_classroom(Classroom(f'R{r}', ROOM_CAPACITIES[r % len(ROOM_CAPACITIES)], 'Main'))
+    return school
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--budget', type=float, default=30.0, help='solver time budget in seconds')
+    parser.add_argument('--sessions', type=int, default=3, help='meetings per course per week')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    slots = weekly_slots()
+    print(f'{len(slots)} weekly slots, {args.sessions} session(s) per course, {args.budget:.0f}s budget')
+    print(f"{'courses':>8}{'students':>10}{'rooms':>7}{'setup s':>9}{'solve s':>9}"
+          f"{'backtracks':>12}{'unplaced':>10}{'valid':>7}")
+    for n in args.sizes:
+        rng = random.Random(args.seed)
+        school = synthetic_school(n, len(slots), args.sessions, rng)
+        solver_started = time.perf_counter()
+        solver = TimetableSolver(school.get_all_courses(), school.get_all_classrooms(), slots, args.sessions)
+        setup = time.perf_counter() - solver_started
+        result = solver.solve(args.budget)
+        valid = not find_violations(result)
+        print(f'{n:>8}{school.get_total_students():>10}{len(school.get_all_classrooms()):>7}'
+              f'{setup:>9.2f}{result.seconds:>9.2f}{result.backtracks:>12}'
+              f'{len(result.unscheduled):>10}{"yes" if valid else "NO":>7}')
+
+
+if __name__ == '__main__':
+    main()
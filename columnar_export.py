@@ -0,0 +1,97 @@
+"""
+Columnar Export
+Streams expense rows as Parquet or Arrow IPC in column batches, so analytics
+tools load typed columns directly instead of re-parsing the CSV export.
+pyarrow is optional; without it AVAILABLE is False and nothing here can run.
+"""
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+AVAILABLE = pa is not None
+
+# (column, arrow type name) in CSV export order
+COLUMNS = [
+    ('id', 'int64'), ('month', 'string'), ('vehicle', 'string'), ('member', 'string'),
+    ('single_way_km', 'float64'), ('double_way_km', 'float64'),
+    ('single_total_cost', 'float64'), ('double_total_cost', 'float64'),
+    ('tds_1_percent', 'float64'), ('maintenance', 'float64'), ('driver_salary', 'float64'),
+    ('vehicle_maintenance', 'float64'), ('cng_gas', 'float64'), ('petrol', 'float64'),
+    ('supervisor_commission', 'float64'), ('company_credit', 'float64'),
+    ('total_deduction', 'float64'), ('total_profit_after_tax', 'float64'),
+]
+
+FORMATS = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+def schema():
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in COLUMNS])
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last take()"""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _batches(rows, batch_rows, sch):
+    """Group row tuples (in COLUMNS order) into RecordBatches of batch_rows rows"""
+    columns = [[] for _ in COLUMNS]
+    count = 0
+    for row in rows:
+        for col, value in zip(columns, row):
+            col.append(value)
+        count += 1
+        if count == batch_rows:
+            yield pa.RecordBatch.from_arrays(columns, schema=sch)
+            columns = [[] for _ in COLUMNS]
+            count = 0
+    if count:
+        yield pa.RecordBatch.from_arrays(columns, schema=sch)
+
+
+def stream_columnar(rows, fmt, batch_rows=10000):
+    """Yield the bytes of a Parquet file or Arrow IPC stream built from rows.
+
+    rows is an iterable of tuples in COLUMNS order; every batch_rows rows
+    become one Parquet row group / Arrow record batch and are yielded as
+    soon as they are encoded.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown columnar format: {fmt}')
+    sch = schema()
+    sink = _ChunkSink()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, sch, compression='snappy')
+    else:
+        writer = pa.ipc.new_stream(sink, sch)
+    for batch in _batches(rows, batch_rows, sch):
+        writer.write_batch(batch)
+        data = sink.take()
+        if data:
+            yield data
+    writer.close()
+    yield sink.take()
@@ -0,0 +1,100 @@
+"""
+Combined Report
+Renders the monthly combined fleet PDF. Each vehicle section is drawn on
+its own scratch canvas (in a process pool when more than one worker is
+configured) and the resulting page content is spliced into one canvas in
+vehicle order, so the PDF is the same whatever the worker count.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+X = 40
+TOP_MARGIN = 40
+BOTTOM_LIMIT = 60
+LINE_HEIGHT = 12
+
+
+def section_end_y(y, row_count, height=letter[1]):
+    """Cursor position after a section of row_count rows starting at y"""
+    y -= 14 + LINE_HEIGHT
+    for _ in range(row_count):
+        y -= LINE_HEIGHT
+        if y < BOTTOM_LIMIT:
+            y = height - TOP_MARGIN
+    y -= 10
+    if y < BOTTOM_LIMIT:
+        y = height - TOP_MARGIN
+    return y
+
+
+def render_section(section):
+    """Draw one vehicle section and return its page content.
+
+    section is (vehicle_name, rows, start_y) where rows are
+    (id, month, member_name, credit, profit) tuples. Returns a list of
+    pages, each the list of PDF content operators drawn on that page; the
+    first continues the page the section starts on.
+    """
+    name, rows, y = section
+    c = canvas.Canvas(None, pagesize=letter)
+    # register fonts in the same order as the combined canvas so internal names match
+    c.setFont('Helvetica-Bold', 16)
+    c._code = []
+    height = letter[1]
+    pages = []
+    c.setFont('Helvetica-Bold', 12)
+    c.drawString(X, y, f'Vehicle: {name} (records: {len(rows)})')
+    y -= 14
+    c.setFont('Helvetica', 9)
+    c.drawString(X, y, 'ID | Month | Member | Credit | Profit')
+    y -= LINE_HEIGHT
+    for rid, month, member, credit, profit in rows:
+        c.drawString(X, y, f"{rid} | {month} | {member} | {credit:.2f} | {profit:.2f}")
+        y -= LINE_HEIGHT
+        if y < BOTTOM_LIMIT:
+            # copy first: showPage appends its own page terminator to _code
+            pages.append(list(c._code))
+            c.showPage()
+            y = height - TOP_MARGIN
+    y -= 10
+    pages.append(c._code)
+    if y < BOTTOM_LIMIT:
+        pages.append([])
+    return pages
+
+
+def render_combined_pdf(fh, month, sections, workers=1):
+    """Draw the combined report for month into the binary file object fh.
+
+    sections: list of (vehicle_name, rows) in report order, rows as in
+    render_section. With workers > 1 the sections are drawn in a process
+    pool; the output is byte-for-byte the same as with one worker.
+    """
+    c = canvas.Canvas(fh, pagesize=letter)
+    width, height = letter
+    y = height - TOP_MARGIN
+    c.setFont('Helvetica-Bold', 16)
+    c.drawString(X, y, f'Fleet Combined Expense Report - {month}')
+    c.setFont('Helvetica', 9)
+    y -= 24
+
+    # start positions only depend on row counts, so sections can be drawn independently
+    jobs = []
+    for name, rows in sections:
+        jobs.append((name, rows, y))
+        y = section_end_y(y, len(rows), height)
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(render_section, jobs))
+    else:
+        rendered = [render_section(job) for job in jobs]
+
+    for pages in rendered:
+        c._code.extend(pages[0])
+        for page in pages[1:]:
+            c.showPage()
+            c._code.extend(page)
+    c.save()
@@ -0,0 +1,75 @@
+"""
+Expense Totals
+The one definition of the derived ExpenseRecord totals. A scalar path
+handles single records and a NumPy path fills whole batches of rows;
+both add the deductions in the same order, so they agree to the bit.
+NumPy is optional and the batch path falls back to the scalar one.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# summed, in this order, into total_deduction
+DEDUCTION_FIELDS = [
+    'tds_1_percent', 'maintenance', 'driver_salary', 'vehicle_maintenance',
+    'cng_gas', 'petrol', 'supervisor_commission',
+]
+INPUT_FIELDS = DEDUCTION_FIELDS + ['company_credit']
+
+
+def compute_totals(values):
+    """(total_deduction, total_profit_after_tax) for a mapping of INPUT_FIELDS"""
+    deduction = 0.0
+    for name in DEDUCTION_FIELDS:
+        deduction += values.get(name) or 0.0
+    return deduction, (values.get('company_credit') or 0.0) - deduction
+
+
+def apply_totals(record):
+    """Set total_deduction and total_profit_after_tax on one ExpenseRecord"""
+    record.total_deduction, record.total_profit_after_tax = compute_totals(
+        {name: getattr(record, name) for name in INPUT_FIELDS})
+
+
+def compute_totals_batch(columns):
+    """Totals for many rows at once.
+
+    columns maps each INPUT_FIELDS name to an equal-length sequence (None
+    counts as 0). Returns (deductions, profits) as arrays, or lists when
+    NumPy is not installed.
+    """
+    if np is None:
+        rows = [dict(zip(INPUT_FIELDS, values)) for values in zip(*(columns[n] for n in INPUT_FIELDS))]
+        totals = [compute_totals(row) for row in rows]
+        return [t[0] for t in totals], [t[1] for t in totals]
+
+    def column(name):
+        return np.array([v or 0.0 for v in columns[name]], dtype=np.float64)
+
+    deduction = np.zeros(len(columns['company_credit']), dtype=np.float64)
+    for name in DEDUCTION_FIELDS:
+        deduction += column(name)
+    return deduction, column('company_credit') - deduction
+
+
+def fill_totals(rows):
+    """Set total_deduction and total_profit_after_tax on a list of row dicts in place"""
+    if not rows:
+        return
+    deduction, profit = compute_totals_batch({name: [row.get(name) for row in rows] for name in INPUT_FIELDS})
+    for row, d, p in zip(rows, deduction, profit):
+        row['total_deduction'] = float(d)
+        row['total_profit_after_tax'] = float(p)
+
+
+def stale_rows(deduction, profit, old_deduction, old_profit):
+    """Indexes of rows whose stored totals differ from the computed ones"""
+    if np is None:
+        return [i for i, values in enumerate(zip(deduction, profit, old_deduction, old_profit))
+                if values[0] != values[2] or values[1] != values[3]]
+    old_deduction = np.array(old_deduction, dtype=np.float64)
+    old_profit = np.array(old_profit, dtype=np.float64)
+    # NULL totals come back as nan, which never compares equal
+    return np.flatnonzero((deduction != old_deduction) | (profit != old_profit)).tolist()
@@ -457,7 +457,7 @@ class SchoolManagementGUI:
     
     def update_staff(self, staff_id, data):
         """Update staff information"""
-        staff = next((s for s in self.school.staff if s.id == staff_id), None)
+        staff = self.school.get_staff(staff_id)
         if staff:
             staff.update_info(**{k: v for k, v in data.items() 
                                if k not in ['department', 'position', 'salary']})
@@ -516,7 +516,7 @@ class SchoolManagementGUI:
         tk.Label(form, text="Teacher:", font=("Arial", 11), bg="#f0f0f0").grid(row=4, column=0, padx=10, pady=8, sticky="w")
         teacher_var = tk.StringVar()
         teacher_combo = ttk.Combobox(form, textvariable=teacher_var, font=("Arial", 11))
-        teacher_combo['values'] = [t.name for t in self.school.teachers]
+        teacher_combo['values'] = [t.name for t in self.school.get_all_teachers()]
         teacher_combo.grid(row=4, column=1, padx=10, pady=8, sticky="ew")
         
         def submit():
@@ -525,7 +525,7 @@ class SchoolManagementGUI:
             
             # Find selected teacher
             selected_teacher = None
-            for teacher in self.school.teachers:
+            for teacher in self.school.get_all_teachers():
                 if teacher.name == teacher_var.get():
                     selected_teacher = teacher
                     break
@@ -588,7 +588,7 @@ class SchoolManagementGUI:
         
         confirm = messagebox.askyesno("Confirm", "Delete this classroom?")
         if confirm:
-            self.school.classrooms = [c for c in self.school.classrooms if c.id != classroom_id]
+            self.school.remove_classroom(classroom_id)
             self.refresh_all_tabs()
             messagebox.showinfo("Success", "Classroom deleted successfully!")
     
@@ -0,0 +1,164 @@
+"""
+Instrumentation
+Opt-in per-request timing for a Flask app: wall time, SQL statement count
+and SQL time (from SQLAlchemy cursor events), reported in a Server-Timing
+header, aggregated for a Prometheus-format /metrics endpoint, and logged
+when a request or a single statement crosses its slow threshold.
+
+Times cover the view up to the response object; the body of a streamed
+response is produced later and is not included.
+"""
+
+import threading
+import time
+
+from flask import Response, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# upper bounds (seconds) of the request duration histogram
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_REPORT_STATEMENTS = 5
+
+
+class _RequestStats:
+    __slots__ = ('started', 'sql_count', 'sql_seconds', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements = []
+
+
+class Instrumentation:
+    """Collect request and SQL timings for one Flask app"""
+
+    def __init__(self, slow_request_ms: float = 500, slow_query_ms: float = 100):
+        self.slow_request_ms = slow_request_ms
+        self.slow_query_ms = slow_query_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (method, endpoint, status) -> [requests, seconds, sql statements, sql seconds]
+        self._totals = {}
+        # (method, endpoint) -> cumulative counts per BUCKETS entry, then +Inf
+        self._histograms = {}
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._clear_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor)
+
+    def detach(self):
+        """Remove the Engine-wide SQL listeners added by init_app.
+
+        They are registered on the Engine class, so they outlive the app;
+        call this before discarding an instrumented app (e.g. in tests).
+        """
+        for name, fn in (('before_cursor_execute', self._before_cursor),
+                         ('after_cursor_execute', self._after_cursor)):
+            if event.contains(Engine, name, fn):
+                event.remove(Engine, name, fn)
+
+    # SQL events
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        stats = getattr(self._local, 'stats', None)
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_seconds += elapsed
+            stats.statements.append((elapsed, statement))
+        if elapsed * 1000 >= self.slow_query_ms and self.app is not None:
+            self.app.logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, _one_line(statement))
+
+    # Request hooks
+    def _start_request(self):
+        self._local.stats = _RequestStats()
+
+    def _clear_request(self, exc=None):
+        self._local.stats = None
+
+    def _finish_request(self, response):
+        stats = getattr(self._local, 'stats', None)
+        if stats is None:
+            return response
+        self._local.stats = None
+        wall = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unmatched'
+        response.headers['Server-Timing'] = (
+            f'total;dur={wall * 1000:.1f}, '
+            f'sql;dur={stats.sql_seconds * 1000:.1f};desc="{stats.sql_count} queries", '
+            f'app;dur={max(wall - stats.sql_seconds, 0.0) * 1000:.1f}'
+        )
+        self._record(request.method, endpoint, response.status_code, wall, stats)
+        if wall * 1000 >= self.slow_request_ms:
+            self._log_slow_request(endpoint, wall, stats)
+        return response
+
+    def _record(self, method, endpoint, status, wall, stats):
+        with self._lock:
+            totals = self._totals.setdefault((method, endpoint, status), [0, 0.0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += stats.sql_count
+            totals[3] += stats.sql_seconds
+            counts = self._histograms.setdefault((method, endpoint), [0] * (len(BUCKETS) + 1))
+            for i, bound in enumerate(BUCKETS):
+                if wall <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+
+    def _log_slow_request(self, endpoint, wall, stats):
+        lines = [f'Slow request {request.method} {request.full_path} ({endpoint}): '
+                 f'{wall * 1000:.1f} ms, {stats.sql_count} queries in {stats.sql_seconds * 1000:.1f} ms']
+        for elapsed, statement in sorted(stats.statements, key=lambda s: s[0], reverse=True)[:SLOW_REPORT_STATEMENTS]:
+            lines.append(f'  {elapsed * 1000:8.1f} ms  {_one_line(statement)}')
+        self.app.logger.warning('\n'.join(lines))
+
+    # Prometheus exposition
+    def render_metrics(self):
+        """Current counters in the Prometheus text exposition format"""
+        with self._lock:
+            totals = {k: list(v) for k, v in self._totals.items()}
+            histograms = {k: list(v) for k, v in self._histograms.items()}
+        out = []
+        series = [
+            ('http_requests_total', 'counter', 'Requests handled.', 0),
+            ('http_request_sql_queries_total', 'counter', 'SQL statements executed by requests.', 2),
+            ('http_request_sql_seconds_total', 'counter', 'Time spent in SQL by requests.', 3),
+        ]
+        for name, kind, help_text, i in series:
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} {kind}')
+            for (method, endpoint, status), values in sorted(totals.items()):
+                out.append(f'{name}{{method="{method}",endpoint="{endpoint}",status="{status}"}} {values[i]}')
+        name = 'http_request_duration_seconds'
+        out.append(f'# HELP {name} Request wall time up to the response.')
+        out.append(f'# TYPE {name} histogram')
+        sums = {}
+        for (method, endpoint, _), values in totals.items():
+            sums[(method, endpoint)] = sums.get((method, endpoint), 0.0) + values[1]
+        for (method, endpoint), counts in sorted(histograms.items()):
+            labels = f'method="{method}",endpoint="{endpoint}"'
+            for bound, count in zip(BUCKETS, counts):
+                out.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            out.append(f'{name}_bucket{{{labels},le="+Inf"}} {counts[-1]}')
+            out.append(f'{name}_sum{{{labels}}} {sums.get((method, endpoint), 0.0)}')
+            out.append(f'{name}_count{{{labels}}} {counts[-1]}')
+        return '\n'.join(out) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def _one_line(statement, limit=300):
+    text = ' '.join(statement.split())
+    return text if len(text) <= limit else text[:limit] + '...'
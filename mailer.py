@@ -0,0 +1,126 @@
+"""
+Mailer
+Pooled SMTP delivery: one authenticated connection reused across messages,
+a bounded outbox queue drained by a worker thread, and retry with
+exponential backoff for transient failures.
+"""
+
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import Future
+
+
+# SMTP errors worth retrying on a fresh connection
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+class Mailer:
+    """Send messages over a reusable SMTP connection from a background outbox"""
+
+    def __init__(self, host: str, port: int = 587, user: str = None, password: str = None,
+                 starttls: bool = True, queue_size: int = 100, max_retries: int = 3,
+                 backoff: float = 1.0, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.outbox = queue.Queue(maxsize=queue_size)
+        self._server = None
+        self._worker = None
+        self._lock = threading.Lock()
+        self._worker_lock = threading.Lock()
+
+    # Connection handling
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    def _connection(self):
+        """Return the open connection, reconnecting if the server dropped it"""
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except smtplib.SMTPException:
+                pass
+            self._drop()
+        self._server = self._connect()
+        return self._server
+
+    def _drop(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    @staticmethod
+    def _is_transient(exc):
+        if isinstance(exc, smtplib.SMTPResponseException):
+            # 4xx replies are temporary, 5xx are permanent
+            return 400 <= exc.smtp_code < 500
+        return isinstance(exc, TRANSIENT_ERRORS)
+
+    def send_now(self, from_addr, recipients, message: str):
+        """Deliver one message on the calling thread, retrying transient failures"""
+        attempt = 0
+        while True:
+            try:
+                with self._lock:
+                    self._connection().sendmail(from_addr, recipients, message)
+                return True, 'Email sent'
+            except Exception as e:
+                with self._lock:
+                    self._drop()
+                if attempt >= self.max_retries or not self._is_transient(e):
+                    return False, str(e)
+                time.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
+
+    # Outbox
+    def enqueue(self, from_addr, recipients, message: str) -> Future:
+        """Queue a message for the worker; the future resolves to (ok, info).
+
+        Blocks while the outbox is full.
+        """
+        self._ensure_worker()
+        future = Future()
+        self.outbox.put((from_addr, recipients, message, future))
+        return future
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._drain, name='mailer-outbox', daemon=True)
+                self._worker.start()
+
+    def _drain(self):
+        while True:
+            item = self.outbox.get()
+            try:
+                if item is None:
+                    return
+                from_addr, recipients, message, future = item
+                future.set_result(self.send_now(from_addr, recipients, message))
+            finally:
+                self.outbox.task_done()
+
+    def close(self):
+        """Deliver everything already queued, then stop the worker and disconnect"""
+        worker = self._worker
+        if worker is not None and worker.is_alive():
+            self.outbox.put(None)
+            worker.join()
+        with self._lock:
+            self._drop()
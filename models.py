@@ -1,16 +1,113 @@
 """
 School Management System - OOP Models
 This module contains all the classes for the school management system.
+The entity classes use __slots__ so large rosters don't pay for a
+per-instance __dict__. Enrollments are kept on both ends of each link: a
+course's roster is a dict used as an ordered set (O(1) to add, remove and
+test however large it grows), while a student's or teacher's handful of
+courses is a tuple, which costs far less memory per entry.
 """
 
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, NamedTuple, Optional
+import re
 import uuid
 
 
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+MINUTES_PER_DAY = 24 * 60
+SLOT_RE = re.compile(
+    r'^\s*(?:(mon|tue|wed|thu|fri|sat|sun)[a-z]*\s+)?(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$',
+    re.IGNORECASE
+)
+
+
+class TimeSlot(NamedTuple):
+    """A parsed time slot: "Mon 09:00-10:30", or "09:00-10:30" for every day
+
+    start and end are minutes after midnight; day is 0 (Mon) to 6 (Sun) or
+    None when the slot repeats daily.
+    """
+    day: Optional[int]
+    start: int
+    end: int
+    
+    @classmethod
+    def parse(cls, text: str) -> 'TimeSlot':
+        """Parse a time-slot string; raises ValueError if it isn't one"""
+        m = SLOT_RE.match(text or '')
+        if not m:
+            raise ValueError(f'Invalid time slot: {text!r}')
+        day = DAYS.index(m.group(1).title()) if m.group(1) else None
+        start = int(m.group(2)) * 60 + int(m.group(3))
+        end = int(m.group(4)) * 60 + int(m.group(5))
+        if int(m.group(3)) > 59 or int(m.group(5)) > 59 or not 0 <= start < end <= MINUTES_PER_DAY:
+            raise ValueError(f'Invalid time slot: {text!r}')
+        return cls(day, start, end)
+    
+    def week_intervals(self):
+        """Half-open [start, end) ranges in minutes from Monday 00:00"""
+        days = range(7) if self.day is None else (self.day,)
+        return [(d * MINUTES_PER_DAY + self.start, d * MINUTES_PER_DAY + self.end) for d in days]
+    
+    def overlaps(self, other: 'TimeSlot') -> bool:
+        same_day = self.day is None or other.day is None or self.day == other.day
+        return same_day and self.start < other.end and other.start < self.end
+    
+    def __str__(self):
+        times = f'{self.start // 60:02d}:{self.start % 60:02d}-{self.end // 60:02d}:{self.end % 60:02d}'
+        return times if self.day is None else f'{DAYS[self.day]} {times}'
+
+
+class IntervalIndex:
+    """Non-overlapping half-open intervals kept sorted by start
+
+    Because intervals never overlap, the ends are sorted too, so checking a
+    range against the index is two binary searches.
+    """
+    
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+        self._items = []
+    
+    def __len__(self):
+        return len(self._starts)
+    
+    def is_free(self, start: int, end: int) -> bool:
+        """True if no stored interval overlaps [start, end) (O(log n))"""
+        i = bisect_left(self._starts, end)
+        return i == 0 or self._ends[i - 1] <= start
+    
+    def overlapping(self, start: int, end: int) -> list:
+        """Items of the stored intervals that overlap [start, end)"""
+        return self._items[bisect_right(self._ends, start):bisect_left(self._starts, end)]
+    
+    def add(self, start: int, end: int, item) -> bool:
+        """Store [start, end) -> item; returns False (and stores nothing) on overlap"""
+        if not self.is_free(start, end):
+            return False
+        i = bisect_left(self._starts, start)
+        self._starts.insert(i, start)
+        self._ends.insert(i, end)
+        self._items.insert(i, item)
+        return True
+    
+    def remove(self, start: int, end: int) -> bool:
+        """Remove the interval starting at start and ending at end"""
+        i = bisect_left(self._starts, start)
+        if i == len(self._starts) or self._starts[i] != start or self._ends[i] != end:
+            return False
+        del self._starts[i], self._ends[i], self._items[i]
+        return True
+
+
 class Person:
     """Base class for all persons in the school"""
     
+    __slots__ = ('id', 'name', 'email', 'phone', 'address', '_created')
+    
     def __init__(self, name: str, email: str, phone: str, address: str):
         self.id = str(uuid.uuid4())[:8]
         self.name = name
@@ -19,6 +116,15 @@ class Person:
         self.address = address
         self.created_at = datetime.now()
     
+    @property
+    def created_at(self) -> datetime:
+        # stored as a float timestamp, which is half the size of a datetime
+        return datetime.fromtimestamp(self._created)
+    
+    @created_at.setter
+    def created_at(self, value: datetime):
+        self._created = value.timestamp()
+    
     def __str__(self):
         return f"{self.name} ({self.id})"
     
@@ -49,23 +155,32 @@ class Person:
 class Student(Person):
     """Student class inheriting from Person"""
     
+    __slots__ = ('grade', 'enrollment_date', 'grades', '_courses')
+    
     def __init__(self, name: str, email: str, phone: str, address: str, 
                  grade: str, enrollment_date: str):
         super().__init__(name, email, phone, address)
         self.grade = grade
         self.enrollment_date = enrollment_date
-        self.courses = []
         self.grades = {}
+        self._courses = ()
+    
+    @property
+    def courses(self) -> List['Course']:
+        """Enrolled courses, in enrollment order"""
+        return list(self._courses)
     
     def add_course(self, course):
         """Add a course to student's enrollment"""
-        if course not in self.courses:
-            self.courses.append(course)
+        if self not in course._students:
+            self._courses += (course,)
+            course._students[self] = None
     
     def remove_course(self, course):
         """Remove a course from student's enrollment"""
-        if course in self.courses:
-            self.courses.remove(course)
+        if self in course._students:
+            del course._students[self]
+            self._courses = tuple(c for c in self._courses if c is not course)
     
     def set_grade(self, course, grade):
         """Set grade for a course"""
@@ -94,22 +209,30 @@ class Student(Person):
 class Teacher(Person):
     """Teacher class inheriting from Person"""
     
+    __slots__ = ('subject', 'salary', '_courses')
+    
     def __init__(self, name: str, email: str, phone: str, address: str,
                  subject: str, salary: float):
         super().__init__(name, email, phone, address)
         self.subject = subject
         self.salary = salary
-        self.courses = []
+        self._courses = ()
+    
+    @property
+    def courses(self) -> List['Course']:
+        """Courses taught, in assignment order"""
+        return list(self._courses)
     
     def add_course(self, course):
         """Add a course to teacher's schedule"""
-        if course not in self.courses:
-            self.courses.append(course)
+        if self not in course._teachers:
+            self._courses += (course,)
+            course._teachers += (self,)
     
     def remove_course(self, course):
         """Remove a course from teacher's schedule"""
-        if course in self.courses:
-            self.courses.remove(course)
+        self._courses = tuple(c for c in self._courses if c is not course)
+        course._teachers = tuple(t for t in course._teachers if t is not self)
     
     def to_dict(self):
         data = super().to_dict()
@@ -124,6 +247,8 @@ class Teacher(Person):
 class Staff(Person):
     """Staff class inheriting from Person"""
     
+    __slots__ = ('department', 'position', 'salary')
+    
     def __init__(self, name: str, email: str, phone: str, address: str,
                  department: str, position: str, salary: float):
         super().__init__(name, email, phone, address)
@@ -144,6 +269,8 @@ class Staff(Person):
 class Course:
     """Course class for managing academic courses"""
     
+    __slots__ = ('id', 'name', 'code', 'description', 'credits', 'teacher', '_students', '_teachers')
+    
     def __init__(self, name: str, code: str, description: str, credits: int,
                  teacher: Teacher = None):
         self.id = str(uuid.uuid4())[:8]
@@ -152,19 +279,28 @@ class Course:
         self.description = description
         self.credits = credits
         self.teacher = teacher
-        self.students = []
+        self._students = {}
+        # teachers with this course on their schedule (Teacher.add_course);
+        # a tuple, as there are only ever one or two
+        self._teachers = ()
+    
+    @property
+    def students(self) -> List[Student]:
+        """Enrolled students, in enrollment order"""
+        return list(self._students)
+    
+    @property
+    def teachers(self) -> List[Teacher]:
+        """Teachers with this course on their schedule, in assignment order"""
+        return list(self._teachers)
     
     def add_student(self, student):
         """Add a student to the course"""
-        if student not in self.students:
-            self.students.append(student)
-            student.add_course(self)
+        student.add_course(self)
     
     def remove_student(self, student):
         """Remove a student from the course"""
-        if student in self.students:
-            self.students.remove(student)
-            student.remove_course(self)
+        student.remove_course(self)
     
     def assign_teacher(self, teacher):
         """Assign a teacher to the course"""
@@ -173,7 +309,7 @@ class Course:
     
     def get_student_count(self):
         """Get number of enrolled students"""
-        return len(self.students)
+        return len(self._students)
     
     def to_dict(self):
         return {
@@ -190,20 +326,63 @@ class Course:
 class Classroom:
     """Classroom class for managing classroom information"""
     
+    __slots__ = ('id', 'room_number', 'capacity', 'building', 'schedule', '_bookings')
+    
     def __init__(self, room_number: str, capacity: int, building: str):
         self.id = str(uuid.uuid4())[:8]
         self.room_number = room_number
         self.capacity = capacity
         self.building = building
+        # schedule entries, and the same entries indexed by week minute
+        # (created with the first booking); change the schedule through the
+        # methods so the two stay in step
         self.schedule = []
+        self._bookings = None
+    
+    def _is_free(self, intervals) -> bool:
+        bookings = self._bookings
+        return bookings is None or all(bookings.is_free(start, end) for start, end in intervals)
     
     def add_to_schedule(self, course, time_slot):
-        """Add a course to the classroom schedule"""
-        self.schedule.append({'course': course, 'time_slot': time_slot})
+        """Add a course to the classroom schedule
+
+        Returns False, leaving the schedule unchanged, if time_slot overlaps
+        an existing booking. Raises ValueError for an unparseable slot.
+        """
+        intervals = TimeSlot.parse(time_slot).week_intervals()
+        if not self._is_free(intervals):
+            return False
+        if self._bookings is None:
+            self._bookings = IntervalIndex()
+        entry = {'course': course, 'time_slot': time_slot}
+        for start, end in intervals:
+            self._bookings.add(start, end, entry)
+        self.schedule.append(entry)
+        return True
+    
+    def remove_from_schedule(self, course, time_slot):
+        """Remove a booking made with add_to_schedule; returns False if there is none"""
+        entry = next((s for s in self.schedule if s['course'] is course and s['time_slot'] == time_slot), None)
+        if entry is None:
+            return False
+        for start, end in TimeSlot.parse(time_slot).week_intervals():
+            self._bookings.remove(start, end)
+        self.schedule.remove(entry)
+        return True
     
     def is_available(self, time_slot):
-        """Check if classroom is available at a given time"""
-        return not any(slot['time_slot'] == time_slot for slot in self.schedule)
+        """Check if classroom is available at a given time (no overlapping booking)"""
+        return self._is_free(TimeSlot.parse(time_slot).week_intervals())
+    
+    def conflicts(self, time_slot) -> List[dict]:
+        """Schedule entries that overlap time_slot"""
+        if self._bookings is None:
+            return []
+        found = {}
+        for start, end in TimeSlot.parse(time_slot).week_intervals():
+            for entry in self._bookings.overlapping(start, end):
+                found[id(entry)] = entry
+        return list(found.values())
     
     def to_dict(self):
         return {
@@ -217,29 +396,67 @@ class Classroom:
 
 
 class School:
-    """Main school management class"""
+    """Main school management class
+
+    Each entity type is kept in a dict keyed by id, so lookups and removals
+    are O(1); dicts keep insertion order, which the get_all_* views rely on.
+    """
     
     def __init__(self, name: str, address: str):
         self.name = name
         self.address = address
-        self.students = []
-        self.teachers = []
-        self.staff = []
-        self.courses = []
-        self.classrooms = []
+        self._students: Dict[str, Student] = {}
+        self._teachers: Dict[str, Teacher] = {}
+        self._staff: Dict[str, Staff] = {}
+        self._courses: Dict[str, Course] = {}
+        self._classrooms: Dict[str, Classroom] = {}
+        # classrooms for find_free_classrooms, which keeps them sorted by capacity
+        self._by_capacity: List[Classroom] = []
+    
+    @staticmethod
+    def _register(registry, entity):
+        """Store entity under its id, issuing a fresh id if another entity holds it"""
+        while registry.get(entity.id, entity) is not entity:
+            entity.id = str(uuid.uuid4())[:8]
+        registry[entity.id] = entity
+    
+    # List views (in insertion order) for callers that iterate
+    @property
+    def students(self) -> List[Student]:
+        return list(self._students.values())
+    
+    @property
+    def teachers(self) -> List[Teacher]:
+        return list(self._teachers.values())
+    
+    @property
+    def staff(self) -> List[Staff]:
+        return list(self._staff.values())
+    
+    @property
+    def courses(self) -> List[Course]:
+        return list(self._courses.values())
+    
+    @property
+    def classrooms(self) -> List[Classroom]:
+        return list(self._classrooms.values())
     
     # Student management
     def add_student(self, student: Student):
         """Add a new student to the school"""
-        self.students.append(student)
+        self._register(self._students, student)
     
     def remove_student(self, student_id: str):
-        """Remove a student from the school"""
-        self.students = [s for s in self.students if s.id != student_id]
+        """Remove a student from the school and drop their enrollments"""
+        student = self._students.pop(student_id, None)
+        if student is not None:
+            for course in student._courses:
+                del course._students[student]
+            student._courses = ()
     
     def get_student(self, student_id: str) -> Optional[Student]:
         """Get a student by ID"""
-        return next((s for s in self.students if s.id == student_id), None)
+        return self._students.get(student_id)
     
     def get_all_students(self) -> List[Student]:
         """Get all students"""
@@ -248,15 +465,21 @@ class School:
     # Teacher management
     def add_teacher(self, teacher: Teacher):
         """Add a new teacher to the school"""
-        self.teachers.append(teacher)
+        self._register(self._teachers, teacher)
     
     def remove_teacher(self, teacher_id: str):
-        """Remove a teacher from the school"""
-        self.teachers = [t for t in self.teachers if t.id != teacher_id]
+        """Remove a teacher from the school and from their courses"""
+        teacher = self._teachers.pop(teacher_id, None)
+        if teacher is not None:
+            for course in teacher._courses:
+                if course.teacher is teacher:
+                    course.teacher = None
+                course._teachers = tuple(t for t in course._teachers if t is not teacher)
+            teacher._courses = ()
     
     def get_teacher(self, teacher_id: str) -> Optional[Teacher]:
         """Get a teacher by ID"""
-        return next((t for t in self.teachers if t.id == teacher_id), None)
+        return self._teachers.get(teacher_id)
     
     def get_all_teachers(self) -> List[Teacher]:
         """Get all teachers"""
@@ -265,11 +488,15 @@ class School:
     # Staff management
     def add_staff(self, staff: Staff):
         """Add a new staff member"""
-        self.staff.append(staff)
+        self._register(self._staff, staff)
     
     def remove_staff(self, staff_id: str):
         """Remove a staff member"""
-        self.staff = [s for s in self.staff if s.id != staff_id]
+        self._staff.pop(staff_id, None)
+    
+    def get_staff(self, staff_id: str) -> Optional[Staff]:
+        """Get a staff member by ID"""
+        return self._staff.get(staff_id)
     
     def get_all_staff(self) -> List[Staff]:
         """Get all staff members"""
@@ -278,15 +505,22 @@ class School:
     # Course management
     def add_course(self, course: Course):
         """Add a new course"""
-        self.courses.append(course)
+        self._register(self._courses, course)
     
     def remove_course(self, course_id: str):
-        """Remove a course"""
-        self.courses = [c for c in self.courses if c.id != course_id]
+        """Remove a course and its enrollments"""
+        course = self._courses.pop(course_id, None)
+        if course is not None:
+            for student in course._students:
+                student._courses = tuple(c for c in student._courses if c is not course)
+            for teacher in course._teachers:
+                teacher._courses = tuple(c for c in teacher._courses if c is not course)
+            course._students.clear()
+            course._teachers = ()
     
     def get_course(self, course_id: str) -> Optional[Course]:
         """Get a course by ID"""
-        return next((c for c in self.courses if c.id == course_id), None)
+        return self._courses.get(course_id)
     
     def get_all_courses(self) -> List[Course]:
         """Get all courses"""
@@ -295,7 +529,28 @@ class School:
     # Classroom management
     def add_classroom(self, classroom: Classroom):
         """Add a new classroom"""
-        self.classrooms.append(classroom)
+        if self._classrooms.get(classroom.id) is not classroom:
+            self._by_capacity.append(classroom)
+        self._register(self._classrooms, classroom)
+    
+    def remove_classroom(self, classroom_id: str):
+        """Remove a classroom"""
+        classroom = self._classrooms.pop(classroom_id, None)
+        if classroom is not None:
+            self._by_capacity.remove(classroom)
+    
+    def find_free_classrooms(self, time_slot: str, min_capacity: int = 0) -> List[Classroom]:
+        """Classrooms seating at least min_capacity that are free at time_slot, smallest first"""
+        intervals = TimeSlot.parse(time_slot).week_intervals()
+        # capacity can change after a room is added, so sort here; when the
+        # order still holds this is a single linear pass
+        self._by_capacity.sort(key=lambda c: c.capacity)
+        first = bisect_left(self._by_capacity, min_capacity, key=lambda c: c.capacity)
+        return [room for room in self._by_capacity[first:] if room._is_free(intervals)]
+    
+    def get_classroom(self, classroom_id: str) -> Optional[Classroom]:
+        """Get a classroom by ID"""
+        return self._classrooms.get(classroom_id)
     
     def get_all_classrooms(self) -> List[Classroom]:
         """Get all classrooms"""
@@ -304,16 +559,16 @@ class School:
     # Statistics
     def get_total_students(self):
         """Get total number of students"""
-        return len(self.students)
+        return len(self._students)
     
     def get_total_teachers(self):
         """Get total number of teachers"""
-        return len(self.teachers)
+        return len(self._teachers)
     
     def get_total_staff(self):
         """Get total number of staff"""
-        return len(self.staff)
+        return len(self._staff)
     
     def get_total_courses(self):
         """Get total number of courses"""
-        return len(self.courses)
+        return len(self._courses)
@@ -0,0 +1,132 @@
+"""
+Report Cache
+Disk-backed, size-capped cache for generated report files (CSV/PDF).
+Entries are content-addressed by a hash of their key and evicted
+least-recently-used first once the cache grows past its size cap.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+
+
+class ReportCache:
+    """Store report files on disk under a hash of (endpoint, filters, version)"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint, filters, version):
+        """Build a stable cache key string from an endpoint, its filters and a data version"""
+        items = sorted((k, '' if v is None else str(v)) for k, v in (filters or {}).items())
+        raw = repr((endpoint, items, str(version)))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Return the path of a cached file, or None on a miss"""
+        path = self._path(key)
+        try:
+            # touch so LRU eviction sees this entry as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def open_reader(self, key):
+        """Return the cached file opened for reading, or None on a miss
+
+        The open handle keeps the data readable even if evict() removes the
+        entry before the caller is done with it.
+        """
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            return open(path, 'rb')
+        except OSError:
+            return None
+
+    def put(self, key, data: bytes):
+        """Store data under key and return the cached file path"""
+        writer = self.open_writer(key)
+        writer.write(data)
+        return writer.commit()
+
+    def open_writer(self, key):
+        """Return a writer that fills the entry incrementally; call commit() when done"""
+        os.makedirs(self.directory, exist_ok=True)
+        return _CacheWriter(self, key)
+
+    def _commit(self, tmp_path, key):
+        path = self._path(key)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Delete least-recently-used entries until the cache fits under max_bytes
+
+        keep names an entry that must survive (the one just written).
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.endswith('.part'):
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+
+
+class _CacheWriter:
+    """Write a cache entry to a temp file and publish it atomically on commit"""
+
+    def __init__(self, cache: ReportCache, key: str):
+        self.cache = cache
+        self.key = key
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.directory, suffix='.part')
+        self.fh = os.fdopen(fd, 'wb')
+
+    def write(self, data: bytes):
+        self.fh.write(data)
+
+    def commit(self):
+        self.fh.close()
+        return self.cache._commit(self.tmp_path, self.key)
+
+    def commit_reader(self):
+        """Commit the entry and return it opened for reading, safe from eviction"""
+        self.fh.close()
+        reader = open(self.tmp_path, 'rb')
+        try:
+            self.cache._commit(self.tmp_path, self.key)
+        except BaseException:
+            reader.close()
+            raise
+        return reader
+
+    def abort(self):
+        self.fh.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
@@ -0,0 +1,347 @@
+"""
+Timetable Solver
+Builds a conflict-free weekly timetable for a School: no teacher or student
+in two classes at once, and every class in a free room that seats its
+enrollment. Sessions are placed most-constrained first by a backtracking
+search with forward checking (placing a session removes its slot from every
+conflicting session's options, and a slot drops out of a session's options
+once no free room there is big enough), within a time budget. Whatever the
+search has not placed when the budget runs out is placed greedily where it
+still fits, and the rest is reported as unscheduled.
+"""
+
+import heapq
+import time
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from models import DAYS, Classroom, Course, TimeSlot
+
+
+def weekly_slots(days: Sequence[str] = DAYS[:5], start: str = '08:00',
+                 periods: int = 8, minutes: int = 60) -> List[str]:
+    """Back-to-back teaching periods on each day, as time-slot strings"""
+    hours, mins = map(int, start.split(':'))
+    first = hours * 60 + mins
+    return [str(TimeSlot(DAYS.index(day), first + p * minutes, first + (p + 1) * minutes))
+            for day in days for p in range(periods)]
+
+
+class TimetableResult(NamedTuple):
+    """Outcome of a solver run"""
+    placements: Dict[Course, List[Tuple[str, Classroom]]]
+    unscheduled: List[Course]
+    seconds: float
+    backtracks: int
+
+    @property
+    def complete(self) -> bool:
+        return not self.unscheduled
+
+
+class TimetableSolver:
+    """Place sessions of courses into (time slot, classroom) pairs
+
+    Each course needs `sessions` meetings a week, in different slots.
+    Bookings already in the classrooms' schedules stay as they are: they
+    count toward their course's sessions, their room is not used in
+    overlapping slots, and their course, students and teachers are busy
+    there.
+    """
+
+    def __init__(self, courses: Sequence[Course], classrooms: Sequence[Classroom],
+                 slots: Optional[Sequence[str]] = None, sessions: int = 1):
+        self.courses = list(courses)
+        self.rooms = sorted(classrooms, key=lambda r: r.capacity)
+        self.slot_names = list(slots or weekly_slots())
+        parsed = [TimeSlot.parse(s) for s in self.slot_names]
+        n_slots = len(parsed)
+        # bit t of overlap_mask[s] is set when slots s and t overlap (s included)
+        self.overlap = [[t for t in range(n_slots) if parsed[s].overlaps(parsed[t])] for s in range(n_slots)]
+        self.overlap_mask = [sum(1 << t for t in ts) for ts in self.overlap]
+
+        # existing bookings: sessions already held per course, and the slots
+        # each course's attendees are busy in (a bit mask over our slots)
+        booked = {}
+        busy = {}
+        for room in self.rooms:
+            for entry in room.schedule:
+                course = entry['course']
+                booked[course] = booked.get(course, 0) + 1
+                taken = TimeSlot.parse(entry['time_slot'])
+                mask = sum(1 << s for s in range(n_slots) if parsed[s].overlaps(taken))
+                for owner in _people(course) | {course}:
+                    busy[owner] = busy.get(owner, 0) | mask
+        blocked = [0] * len(self.courses)
+        for ci, course in enumerate(self.courses):
+            for owner in _people(course) | {course}:
+                blocked[ci] |= busy.get(owner, 0)
+
+        # one variable per session still to place
+        self.var_course = [ci for ci, course in enumerate(self.courses)
+                           for _ in range(max(sessions - booked.get(course, 0), 0))]
+        n_vars = len(self.var_course)
+        self.need = [self.courses[ci].get_student_count() for ci in self.var_course]
+
+        # sessions conflict when their courses share a student or teacher (or are the same course)
+        by_person = {}
+        for ci, course in enumerate(self.courses):
+            for person in _people(course):
+                by_person.setdefault(person, []).append(ci)
+        course_adj = [set() for _ in self.courses]
+        for group in by_person.values():
+            if len(group) > 1:
+                for ci in group:
+                    course_adj[ci].update(group)
+        course_vars = [[] for _ in self.courses]
+        for v, ci in enumerate(self.var_course):
+            course_vars[ci].append(v)
+        self.neighbors = []
+        for v, ci in enumerate(self.var_course):
+            adj = set(course_vars[ci])
+            for other in course_adj[ci]:
+                adj.update(course_vars[other])
+            adj.discard(v)
+            self.neighbors.append(list(adj))
+
+        # free rooms per slot, as parallel ascending capacity/room-index lists
+        caps = [r.capacity for r in self.rooms]
+        self.free_rooms = []
+        self.free_caps = []
+        for name in self.slot_names:
+            free = [i for i, room in enumerate(self.rooms) if room.is_available(name)]
+            self.free_rooms.append(free)
+            self.free_caps.append([caps[i] for i in free])
+
+        # sessions by ascending need, for pruning a slot once its biggest free room shrinks
+        self.by_need = sorted(range(n_vars), key=lambda v: self.need[v])
+        self.sorted_needs = [self.need[v] for v in self.by_need]
+
+        self.domain = [0] * n_vars
+        for v in range(n_vars):
+            fits = sum(1 << s for s in range(n_slots) if self._max_cap(s) >= self.need[v])
+            self.domain[v] = fits & ~blocked[self.var_course[v]]
+        self.assigned: List[Optional[Tuple[int, int]]] = [None] * n_vars
+        self.trail = []
+        self.heap = []
+        for v in range(n_vars):
+            self._push(v)
+        self.backtracks = 0
+
+    # Propagation state
+    def _max_cap(self, s):
+        caps = self.free_caps[s]
+        return caps[-1] if caps else -1
+
+    def _push(self, v):
+        heapq.heappush(self.heap, (self.domain[v].bit_count(), -len(self.neighbors[v]), -self.need[v], v))
+
+    def _select(self):
+        """Pop the unplaced session with the fewest options left (most conflicts, then largest first)"""
+        if len(self.heap) > 4 * len(self.domain) + 1024:
+            # drop the stale entries every domain change and undo leaves behind
+            self.heap = [(self.domain[v].bit_count(), -len(self.neighbors[v]), -self.need[v], v)
+                         for v in range(len(self.domain)) if self.assigned[v] is None]
+            heapq.heapify(self.heap)
+        while self.heap:
+            size, _, _, v = heapq.heappop(self.heap)
+            if self.assigned[v] is None and size == self.domain[v].bit_count():
+                return v
+        return None
+
+    def _restrict(self, v, mask):
+        """Clear mask bits from v's options; returns False if none are left"""
+        old = self.domain[v]
+        new = old & ~mask
+        if new != old:
+            self.trail.append(('domain', v, old))
+            self.domain[v] = new
+            self._push(v)
+        return new != 0
+
+    def _order(self, v):
+        """v's slots, least constraining for unplaced neighbors first, then most rooms to spare"""
+        unplaced = [self.domain[u] for u in self.neighbors[v] if self.assigned[u] is None]
+        need = self.need[v]
+        options = []
+        domain = self.domain[v]
+        while domain:
+            low = domain & -domain
+            s = low.bit_length() - 1
+            domain ^= low
+            mask = self.overlap_mask[s]
+            caps = self.free_caps[s]
+            options.append((sum(1 for d in unplaced if d & mask), bisect_left(caps, need) - len(caps), s))
+        options.sort()
+        return [s for _, _, s in options]
+
+    def _assign(self, v, s, allow_wipeout=False):
+        """Place v in slot s in the smallest free room that fits and propagate.
+
+        Returns False (with everything undone) if no room fits, or if some
+        conflicting session is left without options and allow_wipeout is off.
+        """
+        mark = len(self.trail)
+        caps = self.free_caps[s]
+        pos = bisect_left(caps, self.need[v])
+        if pos == len(caps):
+            return False
+        room = self.free_rooms[s][pos]
+        self.assigned[v] = (s, room)
+        self.trail.append(('assign', v, None))
+        ok = True
+        for t in self.overlap[s]:
+            rooms = self.free_rooms[t]
+            try:
+                i = rooms.index(room) if t != s else pos
+            except ValueError:
+                continue
+            before = self._max_cap(t)
+            del rooms[i]
+            cap = self.free_caps[t].pop(i)
+            self.trail.append(('room', t, (i, room, cap)))
+            after = self._max_cap(t)
+            if after < before:
+                # sessions needing more than what is left can no longer use slot t
+                lo = bisect_left(self.sorted_needs, after + 1)
+                hi = bisect_left(self.sorted_needs, before + 1)
+                for u in self.by_need[lo:hi]:
+                    if self.assigned[u] is None and self.domain[u] >> t & 1:
+                        ok = self._restrict(u, 1 << t) and ok
+        mask = self.overlap_mask[s]
+        for u in self.neighbors[v]:
+            if self.assigned[u] is None:
+                ok = self._restrict(u, mask) and ok
+        if not ok and not allow_wipeout:
+            self._undo(mark)
+            return False
+        return True
+
+    def _undo(self, mark):
+        while len(self.trail) > mark:
+            kind, key, value = self.trail.pop()
+            if kind == 'domain':
+                self.domain[key] = value
+                self._push(key)
+            elif kind == 'room':
+                i, room, cap = value
+                self.free_rooms[key].insert(i, room)
+                self.free_caps[key].insert(i, cap)
+            else:
+                self.assigned[key] = None
+                self._push(key)
+
+    # Search
+    def solve(self, time_budget: float = 10.0) -> TimetableResult:
+        """Search for a complete timetable (once per solver); nothing is written to the classrooms"""
+        started = time.perf_counter()
+        deadline = started + time_budget
+        frames = []  # [session, candidate slots, next candidate, trail mark]
+        advance = True
+        while time.perf_counter() < deadline:
+            if advance:
+                v = self._select()
+                if v is None:
+                    break
+                frames.append([v, self._order(v), 0, len(self.trail)])
+            frame = frames[-1]
+            v, candidates, i, _ = frame
+            placed = False
+            while i < len(candidates) and not placed:
+                placed = self._assign(v, candidates[i])
+                i += 1
+            frame[2] = i
+            if placed:
+                advance = True
+                continue
+            # no slot works for v: take back the previous placement and try its next slot
+            frames.pop()
+            self._push(v)
+            if not frames:
+                break
+            self._undo(frames[-1][3])
+            self.backtracks += 1
+            advance = False
+
+        # out of time (or proven infeasible): place what still fits, without backtracking
+        unscheduled = []
+        while True:
+            v = self._select()
+            if v is None:
+                break
+            if not any(self._assign(v, s, allow_wipeout=True) for s in self._order(v)):
+                self.assigned[v] = (-1, -1)
+                unscheduled.append(v)
+
+        placements = {}
+        for v, (s, room) in enumerate(self.assigned):
+            if s >= 0:
+                placements.setdefault(self.courses[self.var_course[v]], []).append(
+                    (self.slot_names[s], self.rooms[room]))
+        missing = list(dict.fromkeys(self.courses[self.var_course[v]] for v in unscheduled))
+        return TimetableResult(placements, missing, time.perf_counter() - started, self.backtracks)
+
+
+def _people(course: Course) -> set:
+    """Everyone who has to attend course: its students and teachers"""
+    people = set(course.students) | set(course.teachers)
+    if course.teacher is not None:
+        people.add(course.teacher)
+    return people
+
+
+def apply_timetable(result: TimetableResult):
+    """Write a solver result into the classrooms' schedules
+
+    Raises ValueError, leaving the schedules as they were, if a room was
+    booked in one of the result's slots since the solver ran.
+    """
+    written = []
+    for course, bookings in result.placements.items():
+        for time_slot, classroom in bookings:
+            if not classroom.add_to_schedule(course, time_slot):
+                for done_course, done_slot, done_room in written:
+                    done_room.remove_from_schedule(done_course, done_slot)
+                raise ValueError(f'Room {classroom.room_number} is no longer free at {time_slot}')
+            written.append((course, time_slot, classroom))
+
+
+def build_timetable(school, slots: Optional[Sequence[str]] = None, sessions: int = 1,
+                    time_budget: float = 10.0) -> TimetableResult:
+    """Solve a timetable for every course in school and write it into Classroom.schedule
+
+    Sessions already in the schedules are kept, so running it again only
+    places what is missing.
+    """
+    solver = TimetableSolver(school.get_all_courses(), school.get_all_classrooms(), slots, sessions)
+    result = solver.solve(time_budget)
+    apply_timetable(result)
+    return result
+
+
+def find_violations(result: TimetableResult, classrooms: Sequence[Classroom] = ()) -> List[str]:
+    """Describe every double-booking or undersized room (empty when valid)
+
+    Checks the bookings in result together with those already written into
+    the schedules of classrooms.
+    """
+    bookings_by_course = {}
+    for course, bookings in result.placements.items():
+        bookings_by_course.setdefault(course, {}).update(
+            ((time_slot, id(room)), room) for time_slot, room in bookings)
+    for room in classrooms:
+        for entry in room.schedule:
+            bookings_by_course.setdefault(entry['course'], {})[(entry['time_slot'], id(room))] = room
+    problems = []
+    busy = {}
+    for course, bookings in bookings_by_course.items():
+        people = _people(course)
+        for (time_slot, _), room in bookings.items():
+            if room.capacity < course.get_student_count():
+                problems.append(f'{course.name} ({course.get_student_count()}) does not fit room {room.room_number}')
+            for owner in [room, course] + list(people):
+                for other_slot, other_course in busy.get(id(owner), ()):
+                    if TimeSlot.parse(other_slot).overlaps(TimeSlot.parse(time_slot)):
+                        problems.append(f'{course.name} and {other_course.name} clash at {time_slot}')
+                busy.setdefault(id(owner), []).append((time_slot, course))
+    return problems